@@ -0,0 +1,63 @@
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import settings
+
+# Docstring: O motivo desta lógica existir é evitar refazer a consulta da página
+# inicial (últimas ofertas) a cada acesso. Como as escritas acontecem em
+# outros processos, a invalidação usa um token barato lido do próprio SQLite:
+# a versão de `promotions` em data_versions, incrementada por toda escrita
+# (inserção do writer, UPDATE do reprocessamento e DELETE da retenção).
+logger = logging.getLogger("PageCache")
+
+
+async def latest_change_token(db: AsyncSession) -> int:
+    """Busca por chave primária em uma tabela de poucas linhas."""
+    result = await db.execute(
+        text("SELECT COALESCE((SELECT version FROM data_versions WHERE name = 'promotions'), 0)")
+    )
+    return result.scalar_one()
+
+
+def make_etag(token: int) -> str:
+    return f'W/"promos-{token}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    return any(tag.strip() in (etag, "*") for tag in if_none_match.split(","))
+
+
+@dataclass
+class _Entry:
+    token: int
+    value: Any
+    expires_at: float
+
+
+class LatestPageCache:
+    """Cache de uma única entrada com TTL curto, válido enquanto o token não muda."""
+
+    def __init__(self, ttl: float = None):
+        self.ttl = settings.PAGE_CACHE_TTL_SECONDS if ttl is None else ttl
+        self._entry: Optional[_Entry] = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: int) -> Optional[Any]:
+        entry = self._entry
+        if entry is not None and entry.token == token and time.monotonic() < entry.expires_at:
+            self.hits += 1
+            return entry.value
+        self.misses += 1
+        return None
+
+    def put(self, token: int, value: Any):
+        self._entry = _Entry(token, value, time.monotonic() + self.ttl)
+
+    def invalidate(self):
+        self._entry = None
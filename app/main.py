@@ -1,47 +1,172 @@
+import asyncio
 import logging
-import os
+import time
+from typing import Optional
+from urllib.parse import urlencode
 from fastapi import FastAPI, Request, Depends, Form
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from core.database import SessionLocal, PromoModel, ConfigModel
-from fastapi.responses import RedirectResponse
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import LOG_FILE
+from app.cache import LatestPageCache, etag_matches, latest_change_token, make_etag
+from core.database import AsyncSessionLocal, ConfigModel
+from core.logtail import LogFilter, LogFollower, tail
+from core.metrics import HTTP_SECONDS, PAGE_CACHE, collect_snapshots, render_prometheus, summarize
+from core.search import SearchFilters, build_search_stmt, paginate
+from fastapi.responses import PlainTextResponse, RedirectResponse, Response, StreamingResponse
 
 logger = logging.getLogger("WebDashboard")
 app = FastAPI(title="PromoEngine V11")
 templates = Jinja2Templates(directory="app/templates")
+latest_page_cache = LatestPageCache()
 
-def get_db():
-    db = SessionLocal()
-    try: yield db
-    finally: db.close()
+@app.middleware("http")
+async def observe_latency(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # Usa o template da rota (não a URL crua) para não criar uma série por query string
+    route = request.scope.get("route")
+    path = getattr(route, "path", "desconhecida")
+    HTTP_SECONDS.observe(time.perf_counter() - started, path=path, status=str(response.status_code))
+    return response
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def _load_config(db: AsyncSession) -> Optional[ConfigModel]:
+    result = await db.execute(select(ConfigModel).where(ConfigModel.id == "global"))
+    return result.scalar_one_or_none()
+
+def _parse_price(raw: Optional[str]) -> Optional[float]:
+    """Campos vazios do formulário chegam como "", então a conversão é tolerante."""
+    try:
+        return float(raw.replace(",", ".")) if raw else None
+    except ValueError:
+        return None
 
 @app.get("/")
-async def index(request: Request, q: str = None, db: Session = Depends(get_db)):
-    """Dashboard com busca."""
-    query = db.query(PromoModel)
-    if q:
-        query = query.filter(PromoModel.titulo.contains(q))
-    promos = query.order_by(PromoModel.data_captura.desc()).limit(50).all()
-    return templates.TemplateResponse("index.html", {"request": request, "promos": promos, "query": q})
+async def index(
+    request: Request,
+    q: str = None,
+    min_price: str = None,
+    max_price: str = None,
+    fonte: str = None,
+    ordem: str = "recentes",
+    cursor: str = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Dashboard com busca FTS5, filtros de preço/fonte e paginação por cursor."""
+    filters = SearchFilters(
+        q=q, min_price=_parse_price(min_price), max_price=_parse_price(max_price),
+        fonte=fonte or None, order=ordem, cursor=cursor,
+    )
+    # Apenas a página inicial (sem busca/filtros/cursor) passa pelo cache com ETag
+    is_latest_page = not any([filters.match, filters.min_price is not None,
+                              filters.max_price is not None, filters.fonte, filters.cursor])
+    etag = page = None
+    if is_latest_page:
+        token = await latest_change_token(db)
+        etag = make_etag(token)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            PAGE_CACHE.inc(result="not_modified")
+            return Response(status_code=304, headers={"ETag": etag})
+        page = latest_page_cache.get(token)
+        PAGE_CACHE.inc(result="hit" if page is not None else "miss")
+
+    if page is None:
+        rows = (await db.execute(build_search_stmt(filters))).all()
+        page = paginate(rows, filters)
+        if is_latest_page:
+            latest_page_cache.put(token, page)
+    promos, next_cursor = page
+
+    next_url = None
+    if next_cursor:
+        params = {k: v for k, v in request.query_params.items() if k != "cursor" and v}
+        next_url = "/promo_engine/?" + urlencode({**params, "cursor": next_cursor})
+    response = templates.TemplateResponse("index.html", {
+        "request": request, "promos": promos, "query": q, "filters": filters, "next_url": next_url,
+    })
+    if etag:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+    return response
 
 @app.get("/admin")
-async def admin_panel(request: Request, db: Session = Depends(get_db)):
-    config = db.query(ConfigModel).first() or ConfigModel(id="global")
+async def admin_panel(request: Request, db: AsyncSession = Depends(get_db)):
+    config = await _load_config(db) or ConfigModel(id="global")
     return templates.TemplateResponse("admin.html", {"request": request, "config": config})
 
 @app.post("/admin/save")
-async def save_configs(keywords: str = Form(...), channels: str = Form(...), db: Session = Depends(get_db)):
-    config = db.query(ConfigModel).first()
-    config.keywords, config.channels = keywords.lower(), channels.lower().replace(" ", "")
-    db.commit()
+async def save_configs(keywords: str = Form(...), channels: str = Form(...), db: AsyncSession = Depends(get_db)):
+    values = {"keywords": keywords.lower(), "channels": channels.lower().replace(" ", "")}
+    # Sinaliza ao processo do bot que os filtros precisam ser recompilados. O incremento
+    # é feito pelo próprio banco: dois salvamentos simultâneos não perdem uma versão.
+    result = await db.execute(
+        update(ConfigModel).where(ConfigModel.id == "global").values(**values, version=ConfigModel.version + 1)
+    )
+    if result.rowcount == 0:
+        db.add(ConfigModel(id="global", version=1, **values))
+    await db.commit()
     return RedirectResponse(url="/promo_engine/admin", status_code=303)
 
 @app.get("/logs")
-async def view_logs(request: Request):
-    """Lê as últimas 100 linhas do log do motor."""
-    log_path = "logs/engine.log"
-    content = "Arquivo de log não encontrado."
-    if os.path.exists(log_path):
-        with open(log_path, "r") as f:
-            content = "".join(f.readlines()[-100:])
-    return templates.TemplateResponse("logs.html", {"request": request, "content": content})
\ No newline at end of file
+async def view_logs(
+    request: Request,
+    lines: int = 100,
+    level: str = None,
+    logger_name: str = None,
+    q: str = None,
+):
+    """Exibe as últimas linhas do log do motor (inclui arquivos rotacionados se faltar histórico)."""
+    filters = LogFilter(min_level=level or None, logger_name=logger_name or None, contains=q or None)
+    lines = max(1, min(lines, 2000))
+    records = await asyncio.to_thread(tail, LOG_FILE, lines, filters)
+    content = "\n".join(records) if records else "Nenhuma linha de log encontrada."
+    return templates.TemplateResponse("logs.html", {
+        "request": request, "content": content, "filters": filters, "lines": lines,
+    })
+
+@app.get("/logs/stream")
+async def stream_logs(request: Request, level: str = None, logger_name: str = "BotWorker", q: str = None):
+    """Server-Sent Events com as novas linhas do log (por padrão, apenas do BotWorker)."""
+    follower = LogFollower(
+        LOG_FILE, LogFilter(min_level=level or None, logger_name=logger_name or None, contains=q or None)
+    )
+
+    async def events():
+        try:
+            follower.poll()  # Posiciona no fim do arquivo
+            idle = 0.0
+            while not await request.is_disconnected():
+                records = follower.poll()
+                for record in records:
+                    # Cada linha do registro vira um campo data: (o navegador junta com \n)
+                    yield "".join(f"data: {line}\n" for line in record.split("\n")) + "\n"
+                idle = 0.0 if records else idle + 0.5
+                if idle >= 15:
+                    yield ": keep-alive\n\n"
+                    idle = 0.0
+                await asyncio.sleep(0.5)
+        finally:
+            follower.close()
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache", "X-Accel-Buffering": "no",
+    })
+
+@app.get("/metrics")
+async def metrics():
+    """Exposição no formato texto do Prometheus, somando o dashboard e o bot (via snapshot)."""
+    snapshots = await asyncio.to_thread(collect_snapshots, "web")
+    return PlainTextResponse(render_prometheus(snapshots), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/dashboard")
+async def metrics_dashboard(request: Request):
+    """Resumo legível das métricas: contadores, filas e p50/p99 por estágio."""
+    snapshots = await asyncio.to_thread(collect_snapshots, "web")
+    return templates.TemplateResponse("metrics.html", {
+        "request": request, "summary": summarize(snapshots),
+        "processes": [(s["process"], s["pid"], time.time() - s["updated_at"]) for s in snapshots],
+    })
@@ -0,0 +1,175 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Optional
+
+# Docstring: O motivo desta lógica existir é comparar mudanças de performance
+# contra uma linha de base reproduzível. Cada combinação (tamanho do banco x
+# quantidade de palavras-chave) roda em um subprocesso com banco SQLite próprio,
+# usando o handler real do BotWorker alimentado por eventos falsos. A vazão é
+# medida até o writer esvaziar; "cpu ms" e "handler ms" (CPU por mensagem sem a
+# espera do lote) acusam regressões de extração/deduplicação mesmo quando a
+# vazão é limitada pelo disco.
+#
+#   python -m bench --db-sizes 0,50000 --keywords 10,200 --output atual.json
+#   python -m bench --db-sizes 0,50000 --keywords 10,200 --baseline atual.json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Encaminhamento sem limite de taxa: o bench mede a ingestão, não a cota do Telegram
+DEFAULT_ENV = {
+    "API_ID": "1", "API_HASH": "bench", "PHONE_NUMBER": "0", "MY_PRIVATE_GROUP_ID": "1",
+    "FORWARD_RATE_PER_MINUTE": "600000", "FORWARD_BURST": "1000",
+    "LOG_MAX_BYTES": str(50 * 1024 * 1024),
+}
+
+
+def _int_list(raw: str) -> List[int]:
+    return [int(part) for part in raw.split(",") if part.strip()]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Benchmark de ingestão do PromoEngine")
+    parser.add_argument("--messages", type=int, default=2000, help="Mensagens por cenário")
+    parser.add_argument("--db-sizes", type=_int_list, default=[0, 10000], help="Ofertas pré-existentes no banco")
+    parser.add_argument("--keywords", type=_int_list, default=[10, 100], help="Quantidade de palavras-chave")
+    parser.add_argument("--concurrency", type=int, default=0,
+                        help="Handlers em execução simultânea (0 = sem limite, como o Telethon)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.05, help="Reenvios literais")
+    parser.add_argument("--crosspost-ratio", type=float, default=0.10, help="Mesma oferta em outro canal")
+    parser.add_argument("--unmonitored-ratio", type=float, default=0.15, help="Mensagens de canais fora do painel")
+    parser.add_argument("--send-latency", type=float, default=0.0, help="Latência simulada do send_message (s)")
+    parser.add_argument("--drain-timeout", type=float, default=10.0, help="Espera máxima pela fila de envio (s)")
+    parser.add_argument("--set", action="append", default=[], metavar="CHAVE=VALOR",
+                        help="Sobrescreve um Settings (ex.: WRITE_FLUSH_SECONDS=0.05)")
+    parser.add_argument("--output", help="Grava os resultados em JSON (para usar como linha de base)")
+    parser.add_argument("--baseline", help="Compara com um JSON gravado anteriormente por --output")
+    parser.add_argument("--keep", action="store_true", help="Mantém o diretório temporário dos cenários")
+    return parser
+
+
+def _scenario_env(workdir: str, overrides: List[str]) -> Dict[str, str]:
+    env = {**os.environ, **DEFAULT_ENV}
+    env["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    env["METRICS_DIR"] = os.path.join(workdir, "metrics")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")]))
+    for item in overrides:
+        key, _, value = item.partition("=")
+        env[key.strip()] = value.strip()
+    return env
+
+
+def _run_child(args: List[str], workdir: str, env: Dict[str, str]):
+    # cwd isolado: logs/, sessão do Telethon e .env do projeto não interferem
+    completed = subprocess.run(
+        [sys.executable, "-m", "bench.scenario", *args], cwd=workdir, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Cenário falhou ({' '.join(args)}):\n{completed.stderr[-4000:]}")
+
+
+def _copy_db(source_dir: str, target_dir: str):
+    os.makedirs(target_dir, exist_ok=True)
+    for suffix in ("", "-wal", "-shm"):
+        source = os.path.join(source_dir, "bench.db" + suffix)
+        if os.path.exists(source):
+            shutil.copyfile(source, os.path.join(target_dir, "bench.db" + suffix))
+
+
+def run_matrix(options) -> List[Dict]:
+    root = tempfile.mkdtemp(prefix="promo-bench-")
+    results = []
+    try:
+        for db_size in options.db_sizes:
+            # O banco semeado é criado uma vez por tamanho e copiado para cada cenário
+            seed_dir = os.path.join(root, f"seed-{db_size}")
+            os.makedirs(seed_dir)
+            print(f"🌱 Semeando banco com {db_size} ofertas...", flush=True)
+            _run_child(["seed", str(db_size), str(options.seed)], seed_dir, _scenario_env(seed_dir, options.set))
+
+            for keywords in options.keywords:
+                workdir = os.path.join(root, f"run-{db_size}-{keywords}")
+                _copy_db(seed_dir, workdir)
+                params = {
+                    "db_size": db_size, "keywords": keywords, "messages": options.messages,
+                    "concurrency": options.concurrency, "seed": options.seed,
+                    "duplicate_ratio": options.duplicate_ratio, "crosspost_ratio": options.crosspost_ratio,
+                    "unmonitored_ratio": options.unmonitored_ratio, "send_latency": options.send_latency,
+                    "drain_timeout": options.drain_timeout, "overrides": options.set,
+                }
+                params_path = os.path.join(workdir, "params.json")
+                result_path = os.path.join(workdir, "result.json")
+                with open(params_path, "w", encoding="utf-8") as f:
+                    json.dump(params, f)
+                print(f"⏱️  Cenário db={db_size} keywords={keywords}...", flush=True)
+                _run_child(["run", params_path, result_path], workdir, _scenario_env(workdir, options.set))
+                with open(result_path, "r", encoding="utf-8") as f:
+                    results.append(json.load(f))
+    finally:
+        if options.keep:
+            print(f"📁 Cenários mantidos em {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def _key(result: Dict):
+    return result["db_size"], result["keywords"]
+
+
+def _delta(current: float, previous: Optional[float]) -> str:
+    if not previous:
+        return ""
+    return f" ({(current - previous) / previous * 100:+.1f}%)"
+
+
+def print_report(results: List[Dict], baseline: Optional[List[Dict]] = None):
+    previous = {_key(r): r for r in baseline or []}
+    header = (
+        f"{'db':>8} {'kw':>5} {'msg/s':>18} {'cpu ms':>16} {'handler ms':>16} "
+        f"{'p50 ms':>10} {'p99 ms':>20} {'pico MB':>16}  resultados"
+    )
+    print("\n" + header)
+    print("-" * len(header))
+    for result in results:
+        base = previous.get(_key(result))
+        lat = result["latency_ms"]
+        print(
+            f"{result['db_size']:>8} {result['keywords']:>5} "
+            f"{str(result['throughput_msg_s']) + _delta(result['throughput_msg_s'], base and base['throughput_msg_s']):>18} "
+            f"{str(result['cpu_ms_per_msg']) + _delta(result['cpu_ms_per_msg'], base and base.get('cpu_ms_per_msg')):>16} "
+            f"{str(result['handler_ms_per_msg']) + _delta(result['handler_ms_per_msg'], base and base.get('handler_ms_per_msg')):>16} "
+            f"{lat['p50']:>10} "
+            f"{str(lat['p99']) + _delta(lat['p99'], base and base['latency_ms']['p99']):>20} "
+            f"{str(result['peak_rss_mb']) + _delta(result['peak_rss_mb'], base and base['peak_rss_mb']):>16}  "
+            f"{result['results']}"
+        )
+    print("\nLatência por estágio (p50 / p99 em ms):")
+    for result in results:
+        stages = ", ".join(f"{name} {s['p50_ms']:.3f}/{s['p99_ms']:.3f}" for name, s in result["stages"].items())
+        print(f"  db={result['db_size']} kw={result['keywords']}: {stages}")
+
+
+def main(argv: List[str] = None):
+    options = build_parser().parse_args(argv)
+    baseline = None
+    if options.baseline:
+        with open(options.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    results = run_matrix(options)
+    print_report(results, baseline)
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "results": results}, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultados gravados em {options.output}")
+
+
+if __name__ == "__main__":
+    main()
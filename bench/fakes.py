@@ -0,0 +1,116 @@
+import asyncio
+import hashlib
+import itertools
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Tuple
+
+# Docstring: O motivo desta lógica existir é substituir o Telethon no bench.
+# Os objetos expõem apenas os atributos que o BotWorker e o Forwarder usam
+# (event.chat.username, event.message.message/date/id, client.send_message,
+# client.get_peer_id e o filtro `chats` de events.NewMessage),
+# para que o handler real rode sem alterações e sem conexão com o Telegram.
+
+_message_ids = itertools.count(1)
+
+
+def fake_peer_id(username: str) -> int:
+    """Id "marcado" de canal (-100...) estável para um username."""
+    digest = hashlib.blake2b(username.lower().encode(), digest_size=4).digest()
+    return -1_000_000_000_000 - int.from_bytes(digest, "big")
+
+
+@dataclass
+class FakeChat:
+    username: str
+
+    @property
+    def id(self) -> int:
+        return fake_peer_id(self.username)
+
+
+@dataclass
+class FakeMessage:
+    message: str
+    date: datetime
+    id: int = field(default_factory=lambda: next(_message_ids))
+
+
+@dataclass
+class FakeEvent:
+    """Equivalente mínimo de events.NewMessage.Event."""
+    chat: FakeChat
+    message: FakeMessage
+
+    @property
+    def chat_id(self) -> int:
+        return self.chat.id
+
+    @classmethod
+    def build(cls, channel: str, text: str, date: datetime) -> "FakeEvent":
+        return cls(FakeChat(channel), FakeMessage(text, date))
+
+
+@dataclass
+class SentMessage:
+    entity: Any
+    payload: Any
+    kwargs: dict
+
+
+class FakeClient:
+    """
+    Cliente falso: registra os envios em memória e entrega eventos aos
+    handlers registrados, como o TelegramClient faria.
+    """
+
+    def __init__(self, send_latency: float = 0.0):
+        self.send_latency = send_latency
+        self.sent: List[SentMessage] = []
+        self.handlers: List[Tuple[Callable, Any]] = []
+        self._disconnected: Optional[asyncio.Event] = None
+
+    def add_event_handler(self, callback: Callable, event=None):
+        self.handlers.append((callback, event))
+
+    def remove_event_handler(self, callback: Callable, event=None) -> int:
+        before = len(self.handlers)
+        self.handlers = [(cb, ev) for cb, ev in self.handlers if not (cb == callback and (event is None or ev is event))]
+        return before - len(self.handlers)
+
+    async def get_peer_id(self, entity) -> int:
+        return entity if isinstance(entity, int) else fake_peer_id(entity)
+
+    def on(self, event):
+        def decorator(callback):
+            self.add_event_handler(callback, event)
+            return callback
+        return decorator
+
+    async def dispatch(self, event) -> list:
+        """Entrega o evento aos handlers cujo filtro `chats` o aceita (como o Telethon)."""
+        results = []
+        for callback, builder in list(self.handlers):
+            chats = getattr(builder, "chats", None)
+            if chats and event.chat_id not in chats:
+                continue
+            results.append(await callback(event))
+        return results
+
+    async def send_message(self, entity, message, **kwargs):
+        if self.send_latency:
+            await asyncio.sleep(self.send_latency)
+        self.sent.append(SentMessage(entity, message, kwargs))
+        return message
+
+    async def start(self, *args, **kwargs):
+        self._disconnected = asyncio.Event()
+        return self
+
+    async def run_until_disconnected(self):
+        if self._disconnected is not None:
+            await self._disconnected.wait()
+
+    async def disconnect(self):
+        if self._disconnected is not None:
+            self._disconnected.set()
@@ -0,0 +1,133 @@
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Docstring: O motivo desta lógica existir é produzir, sem Telegram, um fluxo
+# de mensagens parecido com o dos canais de promoção brasileiros: preços no
+# formato R$ 1.299,90, parcelamento, cupons, emojis, links com parâmetros de
+# afiliado, reenvios literais e a mesma oferta repostada por outro canal.
+# Com a mesma semente o fluxo é idêntico, o que torna os resultados comparáveis.
+
+PRODUCTS = [
+    ("iPhone 15 128GB", 4299), ("Smartphone Samsung Galaxy S23", 2799), ("Xiaomi Redmi Note 13", 1199),
+    ("Air Fryer Mondial 4L", 299), ("Fritadeira Philco Oven 12L", 549), ("Monitor LG UltraGear 27\"", 1399),
+    ("Notebook Lenovo IdeaPad 3 Ryzen 5", 2899), ("SSD Kingston NV2 1TB", 389), ("Headset HyperX Cloud II", 449),
+    ("Cafeteira Nespresso Essenza Mini", 399), ("Smart TV Samsung 55\" 4K", 2599), ("Echo Dot 5ª Geração", 299),
+    ("Kindle Paperwhite", 749), ("Tênis Nike Revolution 6", 279), ("Cadeira Gamer ThunderX3", 999),
+    ("Aspirador Robô Xiaomi", 1499), ("PlayStation 5 Slim", 3699), ("Controle DualSense", 399),
+    ("Teclado Mecânico Redragon Kumara", 199), ("Mouse Logitech G203", 99), ("Liquidificador Oster 1400W", 229),
+    ("Ventilador Arno 40cm", 189), ("Guarda-roupa Casal 6 Portas", 899), ("Perfume Malbec 100ml", 189),
+    ("Whey Protein Growth 1kg", 119), ("Fone JBL Tune 520BT", 249), ("Câmera de Segurança Intelbras", 179),
+    ("Geladeira Brastemp Frost Free 375L", 3299), ("Micro-ondas Electrolux 31L", 649), ("Escova Secadora Philco", 159),
+]
+STORES = [
+    ("amazon.com.br", "dp/B0{n:08d}", "tag=promo-20&ascsubtag={s}"),
+    ("mercadolivre.com.br", "MLB-{n}-oferta", "matt_tool={s}&matt_word=promo"),
+    ("magazineluiza.com.br", "p/{n}", "utm_source=telegram&utm_campaign={s}"),
+    ("shopee.com.br", "product/{n}", "smtt={s}&utm_medium=affiliates"),
+    ("kabum.com.br", "produto/{n}", "utm_source=canal&ref={s}"),
+    ("aliexpress.com", "item/{n}.html", "aff_fcid={s}&aff_platform=link"),
+]
+HEADLINES = ["🔥", "🚨 CORRE!", "⚡ BAIXOU!", "😱 PREÇÃO", "🏷️ OFERTA", "💥 Relâmpago", "👀 Olha isso"]
+CTAS = ["🛒 Compre aqui:", "👉", "🔗 Link:", "Garanta o seu:", "📲"]
+COUPONS = ["PROMO10", "DESCONTO15", "APP20", "BLACK30", "PRIMEIRACOMPRA", "FRETEGRATIS"]
+FILLER_WORDS = ["oferta", "frete", "grátis", "prime", "cashback", "estoque", "limitado", "hoje"]
+
+
+def format_brl(value: float) -> str:
+    """1299.9 -> '1.299,90' (formato usado pelos canais)."""
+    return f"{value:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+class MessageGenerator:
+    """Gerador determinístico de mensagens de promoção (texto + canal + data)."""
+
+    def __init__(self, seed: int = 42, channels: List[str] = None, unmonitored: List[str] = None,
+                 duplicate_ratio: float = 0.05, crosspost_ratio: float = 0.10, unmonitored_ratio: float = 0.15):
+        self.rng = random.Random(seed)
+        self.channels = channels or ["gafanhotopromocoes", "pelando", "cupomonline", "promobit", "ofertasdodia"]
+        self.unmonitored = unmonitored or ["grupodafamilia", "noticiasgerais"]
+        self.duplicate_ratio = duplicate_ratio
+        self.crosspost_ratio = crosspost_ratio
+        self.unmonitored_ratio = unmonitored_ratio
+        self._serial = seed * 10_000_000
+        self._recent: List[Tuple[Dict, str]] = []  # (oferta, texto) para reenvios e repostagens
+
+    def _offer(self) -> Dict:
+        rng = self.rng
+        self._serial += 1
+        name, base = rng.choice(PRODUCTS)
+        domain, path, _ = rng.choice(STORES)
+        original = round(base * rng.uniform(0.9, 1.4), 2)
+        price = round(original * rng.uniform(0.55, 0.95), 2)
+        return {
+            "name": name,
+            "price": price,
+            "original": original if rng.random() < 0.6 else None,
+            "installments": rng.choice([None, None, 3, 6, 10, 12]),
+            "coupon": rng.choice(COUPONS) if rng.random() < 0.3 else None,
+            "domain": domain,
+            "path": path.format(n=self._serial),
+            "store_index": [s[0] for s in STORES].index(domain),
+        }
+
+    def render(self, offer: Dict) -> str:
+        """Renderiza uma oferta com cabeçalho, emojis e parâmetros de rastreio aleatórios."""
+        rng = self.rng
+        query = STORES[offer["store_index"]][2].format(s=rng.randint(1000, 99999))
+        url = f"https://www.{offer['domain']}/{offer['path']}?{query}"
+        lines = [f"{rng.choice(HEADLINES)} {offer['name']}", ""]
+        if offer["original"]:
+            lines.append(f"❌ De R$ {format_brl(offer['original'])}")
+            lines.append(f"✅ Por R$ {format_brl(offer['price'])}")
+        else:
+            lines.append(f"💰 Apenas R$ {format_brl(offer['price'])}")
+        if offer["installments"]:
+            lines.append(f"💳 ou {offer['installments']}x de R$ {format_brl(offer['price'] / offer['installments'])} sem juros")
+        if offer["coupon"]:
+            lines.append(f"🎟️ Cupom: {offer['coupon']}")
+        if rng.random() < 0.4:
+            lines.append(" ".join(rng.sample(FILLER_WORDS, 3)).capitalize() + " ✨")
+        lines += ["", f"{rng.choice(CTAS)} {url}"]
+        return "\n".join(lines)
+
+    def message(self) -> Tuple[str, str]:
+        """Próxima mensagem do fluxo: (canal, texto)."""
+        rng = self.rng
+        roll = rng.random()
+        if self._recent and roll < self.duplicate_ratio:
+            # Reenvio literal (o mesmo canal repete a postagem)
+            offer, text = rng.choice(self._recent)
+            return rng.choice(self.channels), text
+        if self._recent and roll < self.duplicate_ratio + self.crosspost_ratio:
+            # Mesma oferta repostada por outro canal, com cabeçalho e rastreio diferentes
+            offer, _ = rng.choice(self._recent)
+            return rng.choice(self.channels), self.render(offer)
+
+        offer = self._offer()
+        text = self.render(offer)
+        self._recent.append((offer, text))
+        if len(self._recent) > 500:
+            self._recent.pop(0)
+        pool = self.unmonitored if rng.random() < self.unmonitored_ratio else self.channels
+        return rng.choice(pool), text
+
+    def stream(self, count: int, start: Optional[datetime] = None, spacing_seconds: float = 1.0
+               ) -> Iterator[Tuple[str, str, datetime]]:
+        """Gera `count` mensagens com datas crescentes: (canal, texto, data)."""
+        moment = start or datetime.now(timezone.utc)
+        for _ in range(count):
+            channel, text = self.message()
+            yield channel, text, moment
+            moment += timedelta(seconds=spacing_seconds)
+
+    def keywords(self, count: int) -> List[str]:
+        """Palavras-chave do painel: termos reais de produto primeiro, depois termos sintéticos."""
+        vocabulary = []
+        for name, _ in PRODUCTS:
+            for word in name.lower().split():
+                if len(word) > 3 and word.isalpha() and word not in vocabulary:
+                    vocabulary.append(word)
+        self.rng.shuffle(vocabulary)
+        extra = [f"modelo{i:05d}" for i in range(max(0, count - len(vocabulary)))]
+        return (vocabulary + extra)[:count]
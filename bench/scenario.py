@@ -0,0 +1,207 @@
+import asyncio
+import json
+import resource
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+from bench.fakes import FakeClient, FakeEvent
+from bench.generator import MessageGenerator
+
+# Docstring: O motivo desta lógica existir é executar um único cenário do bench
+# em um processo limpo. O processo pai define DATABASE_URL e demais variáveis
+# antes do import de config/core, e mede o pico de memória deste processo sem
+# interferência de outros cenários. Não deve ser importado pelo serviço.
+#
+# A vazão é a da ingestão sustentada: todos os eventos são despachados de uma
+# vez (uma task por update, como no Telethon) e o relógio para quando o writer
+# gravou a última linha. Com handlers limitados, a vazão seria só
+# concorrência / WRITE_FLUSH_SECONDS; por isso o CPU gasto por mensagem é
+# reportado à parte, sem a espera do lote.
+
+SEED_CHUNK = 5000
+# Estágios que rodam no handler sem esperar o writer nem a fila de envio
+HANDLER_STAGES = ("filter", "dedup", "extract", "keywords")
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def seed_database(size: int, seed: int):
+    """Cria o schema e insere `size` ofertas históricas (últimos dias, dentro da retenção)."""
+    from sqlalchemy import insert, text
+    from core.database import PromoModel, SessionLocal, engine, init_db
+    from core.dedup import Deduplicator
+    from core.extraction import extractor
+
+    init_db()
+    generator = MessageGenerator(seed=seed + 1)  # Semente diferente: não colide com o fluxo medido
+    start = datetime.utcnow() - timedelta(days=5)
+    spacing = (5 * 86400) / max(size, 1)
+    db = SessionLocal()
+    try:
+        rows, seen = [], set()
+        for channel, message, posted_at in generator.stream(size, start, spacing):
+            msg_id = Deduplicator.generate_id(message)
+            if msg_id in seen:
+                continue
+            seen.add(msg_id)
+            rows.append({
+                **extractor.scan(message), "id": msg_id, "fonte": f"@{channel}", "mensagem": message,
+                "data_postagem": posted_at, "data_captura": posted_at,
+            })
+            if len(rows) >= SEED_CHUNK:
+                db.execute(insert(PromoModel), rows)
+                db.commit()
+                rows = []
+        if rows:
+            db.execute(insert(PromoModel), rows)
+            db.commit()
+        db.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def _stage_summary() -> Dict[str, Dict[str, float]]:
+    from core.metrics import STAGE_SECONDS, histogram_quantile
+    summary = {}
+    for key, (counts, total, count) in STAGE_SECONDS.values.items():
+        stage = dict(key).get("stage", "?")
+        summary[stage] = {
+            "count": count,
+            "avg_ms": round(total / count * 1000, 4) if count else 0.0,
+            "p50_ms": round((histogram_quantile(0.5, STAGE_SECONDS.buckets, counts) or 0) * 1000, 4),
+            "p99_ms": round((histogram_quantile(0.99, STAGE_SECONDS.buckets, counts) or 0) * 1000, 4),
+        }
+    return summary
+
+
+async def _drain(tasks: List[asyncio.Task], writer) -> None:
+    """
+    Espera todos os handlers. Quando nenhum handler novo chega ao writer entre
+    duas verificações, pede o flush do lote parcial: sem isso a medição
+    terminaria com um intervalo inteiro do timer do writer.
+    """
+    pending = set(tasks)
+    enqueued = -1
+    while pending:
+        _, pending = await asyncio.wait(pending, timeout=0.01)
+        if writer.stats["enqueued"] == enqueued:
+            writer.flush()
+        enqueued = writer.stats["enqueued"]
+
+
+async def run_scenario(params: Dict) -> Dict:
+    """Dispara o fluxo sintético no handler real e devolve as medições."""
+    from core.bot import PromotionBot
+    from core.database import ConfigModel, PromoModel, SessionLocal
+
+    generator = MessageGenerator(
+        seed=params["seed"], duplicate_ratio=params["duplicate_ratio"],
+        crosspost_ratio=params["crosspost_ratio"], unmonitored_ratio=params["unmonitored_ratio"],
+    )
+    db = SessionLocal()
+    try:
+        db.merge(ConfigModel(
+            id="global", keywords=",".join(generator.keywords(params["keywords"])),
+            channels=",".join(generator.channels), version=1,
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+    events = [FakeEvent.build(*item) for item in generator.stream(params["messages"], datetime.now(timezone.utc))]
+    client = FakeClient(send_latency=params["send_latency"])
+    bot = PromotionBot(client=client)
+    lifecycle = asyncio.get_running_loop().create_task(bot.start())
+    while not bot.forwarder.running:
+        if lifecycle.done():
+            lifecycle.result()  # Propaga a falha de inicialização
+        await asyncio.sleep(0.01)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    latencies: List[float] = []
+    results: Counter = Counter()
+    # 0 = sem limite (como o Telethon); > 0 limita quantos handlers ficam em voo
+    semaphore = asyncio.Semaphore(params["concurrency"]) if params["concurrency"] > 0 else None
+
+    async def deliver(event: FakeEvent):
+        started = time.perf_counter()
+        handled = await client.dispatch(event)
+        latencies.append(time.perf_counter() - started)
+        # Sem handler: o filtro de chats da inscrição descartou o evento (canal não monitorado)
+        results[handled[0] if handled else "filtered"] += 1
+
+    async def deliver_bounded(event: FakeEvent):
+        async with semaphore:
+            await deliver(event)
+
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    tasks = [asyncio.ensure_future((deliver_bounded if semaphore else deliver)(event)) for event in events]
+    await _drain(tasks, bot.writer)
+    elapsed = time.perf_counter() - started
+    # CPU do processo inteiro (handlers, writer e SQLite); independe do timer do writer
+    cpu_seconds = time.process_time() - cpu_started
+    stages = _stage_summary()
+    handler_seconds = sum(stages[name]["avg_ms"] * stages[name]["count"] for name in HANDLER_STAGES if name in stages) / 1000
+
+    # Espera a fila de encaminhamento esvaziar (o envio não entra na vazão de ingestão)
+    deadline = time.monotonic() + params["drain_timeout"]
+    while len(client.sent) < results["queued"] and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    await bot.stop()
+    await lifecycle
+
+    db = SessionLocal()
+    try:
+        total_rows = db.query(PromoModel).count()
+    finally:
+        db.close()
+
+    latencies.sort()
+    return {
+        **params,
+        "elapsed_s": round(elapsed, 4),
+        "throughput_msg_s": round(len(events) / elapsed, 1) if elapsed else 0.0,
+        "cpu_ms_per_msg": round(cpu_seconds / len(events) * 1000, 4) if events else 0.0,
+        "handler_ms_per_msg": round(handler_seconds / len(events) * 1000, 4) if events else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50) * 1000, 3),
+            "p95": round(percentile(latencies, 0.95) * 1000, 3),
+            "p99": round(percentile(latencies, 0.99) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        },
+        "results": dict(results),
+        "forwarded": len(client.sent),
+        "db_rows_after": total_rows,
+        # ru_maxrss é em KiB no Linux
+        "rss_before_mb": round(rss_before / 1024, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "writer": {k: bot.writer.stats[k] for k in ("batches", "inserted", "duplicates", "max_depth")},
+        "stages": stages,
+    }
+
+
+def main(argv: List[str]):
+    command = argv[0]
+    if command == "seed":
+        seed_database(int(argv[1]), int(argv[2]))
+    elif command == "run":
+        with open(argv[1], "r", encoding="utf-8") as f:
+            params = json.load(f)
+        result = asyncio.run(run_scenario(params))
+        with open(argv[2], "w", encoding="utf-8") as f:
+            json.dump(result, f)
+    else:
+        raise SystemExit(f"Comando desconhecido: {command}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,23 +1,83 @@
+import gzip
 import logging
+import multiprocessing
 import os
+import shutil
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, WatchedFileHandler
 from pydantic_settings import BaseSettings
 from typing import List
 
 # Infraestrutura de Logs
 LOG_DIR = "logs"
+LOG_FILE = os.path.join(LOG_DIR, "engine.log")
+# Lidos direto do ambiente porque o logging sobe antes do Settings
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 10))
 if not os.path.exists(LOG_DIR):
     os.makedirs(LOG_DIR)
 
+def _gzip_namer(name: str) -> str:
+    return name + ".gz"
+
+def _gzip_rotator(source: str, dest: str):
+    """Compacta o arquivo rotacionado (engine.log.1 -> engine.log.1.gz)."""
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+_file_handler = RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+_file_handler.namer = _gzip_namer
+_file_handler.rotator = _gzip_rotator
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler(os.path.join(LOG_DIR, "engine.log")),
+        _file_handler,
         logging.StreamHandler()
     ]
 )
 logger = logging.getLogger("ConfigModule")
 
+# Um único processo rotaciona o engine.log. Com vários processos rotacionando o
+# mesmo arquivo cada um segue gravando no próprio descritor (já renomeado ou
+# apagado) e as linhas somem. No `run.py serve` os filhos (web e workers)
+# enviam os registros por uma fila ao processo principal, dono do arquivo.
+_log_listener = None
+
+def start_log_listener():
+    """Processo principal: passa a gravar também os registros dos filhos. Devolve a fila."""
+    global _log_listener
+    queue = multiprocessing.Queue(-1)
+    _log_listener = QueueListener(queue, _file_handler, respect_handler_level=True)
+    _log_listener.start()
+    return queue
+
+def stop_log_listener():
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+def attach_log_queue(queue):
+    """Processo filho (fork): troca o handler de arquivo herdado pela fila do processo principal."""
+    root = logging.getLogger()
+    root.removeHandler(_file_handler)
+    _file_handler.close()
+    root.addHandler(QueueHandler(queue))
+
+def use_watched_log_file():
+    """
+    Processos avulsos (backfill, replay, retenção, workers > 0) não rotacionam:
+    gravam no engine.log e reabrem o arquivo quando o dono o rotaciona.
+    """
+    root = logging.getLogger()
+    root.removeHandler(_file_handler)
+    _file_handler.close()
+    handler = WatchedFileHandler(LOG_FILE, encoding="utf-8")
+    handler.setFormatter(_file_handler.formatter)
+    root.addHandler(handler)
+
 class Settings(BaseSettings):
     """
     Docstring: Esquema de configurações.
@@ -31,9 +91,59 @@ class Settings(BaseSettings):
     
     # Atributo CRÍTICO para a conexão
     DATABASE_URL: str = "sqlite:///./promo_engine.db"
+    DB_BUSY_TIMEOUT_MS: int = 5000
+    DB_POOL_SIZE: int = 5  # Conexões de leitura do dashboard (engine assíncrona)
+    DB_POOL_OVERFLOW: int = 10
     
     TARGET_CHANNELS: List[str] = ["gafanhotopromocoes", "pelando", "cupomonline"]
 
+    # Filtros do BotWorker
+    FILTER_REFRESH_SECONDS: float = 2.0  # Intervalo máximo para perceber mudanças salvas no painel
+    KEYWORD_WORD_BOUNDARY: bool = False  # True = casa apenas palavras inteiras
+    KEYWORD_ACCENT_INSENSITIVE: bool = True  # True = "câmera" casa com "camera"
+
+    # Pipeline de escrita em lote
+    WRITE_BATCH_SIZE: int = 200
+    WRITE_FLUSH_SECONDS: float = 0.5
+    WRITE_QUEUE_MAXSIZE: int = 5000
+
+    # Backfill / replay
+    BACKFILL_CONCURRENCY: int = 4  # Canais paginados em paralelo
+    BACKFILL_PAGE_SIZE: int = 200  # Mensagens processadas (e checkpoint salvo) por página
+    BACKFILL_DEFAULT_DAYS: int = 3  # Alcance da primeira execução de um canal sem checkpoint
+
+    # Encaminhamento para o grupo privado
+    FORWARD_RATE_PER_MINUTE: float = 20.0  # Reposição do token bucket
+    FORWARD_BURST: int = 5  # Envios seguidos permitidos antes de limitar
+    FORWARD_MAX_ATTEMPTS: int = 5
+    FORWARD_DIGEST_SECONDS: int = 0  # > 0 agrupa os matches em um resumo por intervalo
+    FORWARD_DIGEST_MAX_ITEMS: int = 10
+
+    # Retenção: ofertas antigas saem do banco em lotes e vão para arquivos frios
+    RETENTION_DAYS: int = 7
+    RETENTION_INTERVAL_SECONDS: float = 900.0
+    RETENTION_BATCH_SIZE: int = 500  # Linhas por transação (lock curto no SQLite)
+    RETENTION_BATCH_PAUSE_SECONDS: float = 0.05  # Pausa entre lotes para o writer do bot
+    RETENTION_VACUUM_PAGES: int = 2000  # Páginas liberadas por execução (PRAGMA incremental_vacuum)
+    ARCHIVE_DIR: str = "archive"  # Vazio desativa o arquivamento (apenas apaga)
+
+    # Modo particionado (run.py serve --workers N): cada worker escuta uma fatia dos canais
+    SHARD_PHONE_NUMBERS: List[str] = []  # Uma conta por worker; vazio = PHONE_NUMBER em sessões separadas
+    CHANNEL_RESOLVE_RETRY_SECONDS: float = 300.0  # Nova tentativa para canais que não resolveram
+
+    # Métricas compartilhadas entre o bot e o dashboard
+    METRICS_DIR: str = "run/metrics"
+    METRICS_EXPORT_SECONDS: float = 5.0
+
+    # Cache da página inicial do dashboard
+    PAGE_CACHE_TTL_SECONDS: float = 5.0
+
+    # Deduplicação em memória
+    DEDUP_CACHE_SIZE: int = 100_000  # Ids exatos mantidos no LRU (aquecido do banco no boot)
+    DEDUP_NEAR_ENABLED: bool = True  # Colapsa repostagens entre canais (SimHash)
+    DEDUP_NEAR_WINDOW_MINUTES: int = 120
+    DEDUP_NEAR_MAX_DISTANCE: int = 3  # Bits de diferença tolerados (máx. 3 com 4 bandas)
+
     model_config = {
         "env_file": ".env",
         "env_file_encoding": "utf-8",
@@ -0,0 +1,200 @@
+import asyncio
+import json
+import logging
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, TextIO
+from config import settings
+from core.bot import PromotionBot
+from core.database import SessionLocal, ChannelCheckpointModel
+from core.metrics import run_exporter
+
+# Docstring: O motivo desta lógica existir é recuperar o que foi postado enquanto
+# o bot estava fora do ar. Cada canal é paginado em paralelo a partir do seu
+# último id salvo (checkpoint), e as mensagens passam pelo mesmo caminho do
+# tempo real (filtro, deduplicação, extração e escrita em lote). O modo replay
+# reprocessa um arquivo JSONL local, sem conexão com o Telegram.
+logger = logging.getLogger("Backfill")
+
+
+def load_checkpoint(channel: str) -> int:
+    db = SessionLocal()
+    try:
+        row = db.get(ChannelCheckpointModel, channel)
+        return row.last_message_id if row else 0
+    finally:
+        db.close()
+
+
+def save_checkpoint(channel: str, last_message_id: int):
+    db = SessionLocal()
+    try:
+        row = db.get(ChannelCheckpointModel, channel)
+        if row is None:
+            db.add(ChannelCheckpointModel(channel=channel, last_message_id=last_message_id))
+        elif last_message_id > row.last_message_id:
+            row.last_message_id = last_message_id
+        db.commit()
+    finally:
+        db.close()
+
+
+class Backfiller:
+    """Orquestra backfill (via Telegram) e replay (via arquivo JSONL) sobre um PromotionBot."""
+
+    def __init__(self, bot: PromotionBot, page_size: int = None, forward: bool = False):
+        self.bot = bot
+        self.page_size = page_size or settings.BACKFILL_PAGE_SIZE
+        self.forward = forward
+        self.stats: Counter = Counter()
+        self._capture: Optional[TextIO] = None
+
+    async def _process_page(self, page: List[Dict]) -> Optional[int]:
+        """
+        Processa uma página concorrentemente: todas as linhas entram na fila do
+        writer de uma vez e são gravadas em poucos INSERTs em lote.
+        Retorna a posição da primeira mensagem que falhou (None se nenhuma).
+        """
+        tasks = [
+            asyncio.ensure_future(self.bot.process_message(m["channel"], m["text"], m.get("date"), forward=self.forward))
+            for m in page
+        ]
+        # Um ciclo do loop basta para todas as tasks enfileirarem; então o lote é gravado sem esperar o intervalo
+        await asyncio.sleep(0)
+        self.bot.writer.flush()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        first_failure = None
+        for position, result in enumerate(results):
+            if isinstance(result, Exception):
+                self.stats["error"] += 1
+                logger.error(f"❌ Falha ao processar mensagem do backfill: {result}")
+                if first_failure is None:
+                    first_failure = position
+            else:
+                self.stats[result] += 1
+        return first_failure
+
+    def _record(self, item: Dict):
+        if self._capture is not None:
+            row = {**item, "date": item["date"].isoformat() if item.get("date") else None}
+            self._capture.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    async def _backfill_channel(self, channel: str, since: Optional[datetime], limit: Optional[int],
+                                semaphore: asyncio.Semaphore):
+        async with semaphore:
+            last_id = await asyncio.to_thread(load_checkpoint, channel)
+            kwargs = {"reverse": True, "limit": limit}
+            if last_id:
+                kwargs["min_id"] = last_id
+            elif since is not None:
+                kwargs["offset_date"] = since
+            logger.info(f"⏪ Backfill de @{channel} a partir do id {last_id or since}...")
+
+            page: List[Dict] = []
+            fetched = 0
+            # Depois de uma falha o checkpoint fica parado: a próxima execução
+            # retoma dali (o que já foi gravado volta como duplicata)
+            checkpoint_open = True
+            async for message in self.bot.client.iter_messages(channel, **kwargs):
+                item = {"channel": channel, "id": message.id, "text": message.message, "date": message.date}
+                self._record(item)
+                page.append(item)
+                if len(page) >= self.page_size:
+                    checkpoint_open = await self._flush_page(channel, page, checkpoint_open)
+                    fetched += len(page)
+                    page = []
+            if page:
+                checkpoint_open = await self._flush_page(channel, page, checkpoint_open)
+                fetched += len(page)
+            if checkpoint_open:
+                logger.info(f"✅ Backfill de @{channel} concluído: {fetched} mensagens.")
+            else:
+                logger.warning(f"⚠️ Backfill de @{channel} concluído com falhas: {fetched} mensagens; "
+                               "o checkpoint parou antes da primeira falha.")
+
+    async def _flush_page(self, channel: str, page: List[Dict], checkpoint_open: bool) -> bool:
+        """Processa a página e avança o checkpoint até a mensagem anterior à primeira falha."""
+        first_failure = await self._process_page(page)
+        if not checkpoint_open:
+            return False
+        # Páginas em ordem crescente de id (iter_messages com reverse=True)
+        done = page if first_failure is None else page[:first_failure]
+        if done:
+            await asyncio.to_thread(save_checkpoint, channel, max(m["id"] for m in done))
+        return first_failure is None
+
+    async def backfill(self, channels: Iterable[str] = None, days: int = None, limit: int = None,
+                       concurrency: int = None, capture_path: str = None) -> Counter:
+        """Executa o backfill de todos os canais monitorados (ou dos informados)."""
+        channels = list(channels or sorted(self.bot.filters.get().channels))
+        days = settings.BACKFILL_DEFAULT_DAYS if days is None else days
+        since = datetime.now(timezone.utc) - timedelta(days=days) if days else None
+        semaphore = asyncio.Semaphore(concurrency or settings.BACKFILL_CONCURRENCY)
+
+        started = time.perf_counter()
+        self.bot.dedup.near.evict_by_time = False  # Mensagens fora de ordem entre canais
+        self.bot.dedup.warm_up()
+        self.bot.writer.start()
+        self.bot.register_metrics()
+        exporter = asyncio.get_running_loop().create_task(run_exporter("backfill"))
+        self._capture = open(capture_path, "a", encoding="utf-8") if capture_path else None
+        try:
+            await self.bot.client.start(phone=settings.PHONE_NUMBER)
+            if self.forward:
+                self.bot.forwarder.start()
+            await asyncio.gather(*(self._backfill_channel(c, since, limit, semaphore) for c in channels))
+        finally:
+            # Matches ainda não enviados ficam na fila persistente para o modo serve
+            await self.bot.forwarder.stop()
+            await self.bot.writer.stop()
+            await self.bot.client.disconnect()
+            if self._capture is not None:
+                self._capture.close()
+                self._capture = None
+            # Cancelado, o exporter apaga o snapshot: o resumo fica no log
+            exporter.cancel()
+        self._log_summary("Backfill", started)
+        return self.stats
+
+    async def replay(self, path: str) -> Counter:
+        """
+        Reprocessa um arquivo JSONL com uma mensagem por linha:
+        {"channel": "pelando", "text": "...", "date": "2024-11-29T10:00:00+00:00", "id": 123}
+        """
+        started = time.perf_counter()
+        self.bot.dedup.near.evict_by_time = False  # Mensagens fora de ordem entre canais
+        self.bot.dedup.warm_up()
+        self.bot.writer.start()
+        self.bot.register_metrics()
+        try:
+            page: List[Dict] = []
+            with open(path, "r", encoding="utf-8") as f:
+                for number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        item = json.loads(line)
+                        if "channel" not in item or "text" not in item:
+                            raise KeyError("campos obrigatórios: channel, text")
+                        item["date"] = datetime.fromisoformat(item["date"]) if item.get("date") else None
+                    except (ValueError, TypeError, KeyError) as e:
+                        self.stats["invalid"] += 1
+                        logger.warning(f"⚠️ Linha {number} inválida no arquivo de replay: {e}")
+                        continue
+                    page.append(item)
+                    if len(page) >= self.page_size:
+                        await self._process_page(page)
+                        page = []
+            if page:
+                await self._process_page(page)
+        finally:
+            await self.bot.writer.stop()
+        self._log_summary("Replay", started)
+        return self.stats
+
+    def _log_summary(self, mode: str, started: float):
+        elapsed = time.perf_counter() - started
+        total = sum(self.stats.values())
+        rate = total / elapsed if elapsed else 0.0
+        logger.info(f"📊 {mode}: {total} mensagens em {elapsed:.1f}s ({rate:.0f} msg/s) -> {dict(self.stats)}")
@@ -1,10 +1,17 @@
 import logging
-import re
-import hashlib
 import asyncio
+import time
+from datetime import datetime, timezone
+from typing import FrozenSet, List, Optional, Tuple
 from telethon import TelegramClient, events
 from config import settings
-from core.database import SessionLocal, PromoModel, ConfigModel
+from core.dedup import Deduplicator, SharedClaimStore
+from core.extraction import extractor
+from core.filters import FilterCache, FilterSnapshot
+from core.forwarder import Forwarder, compute_priority
+from core.metrics import CACHE_ENTRIES, ERRORS, MESSAGES, QUEUE_DEPTH, STAGE_SECONDS, run_exporter
+from core.retention import RetentionScheduler
+from core.writer import PromoWriter
 
 # Docstring: O motivo desta lógica existir é centralizar o motor de captura.
 # Ele transforma mensagens brutas do Telegram em dados estruturados no SQLite
@@ -12,108 +19,246 @@ from core.database import SessionLocal, PromoModel, ConfigModel
 logger = logging.getLogger("BotWorker")
 
 class PromotionBot:
-    def __init__(self):
-        """Inicializa o cliente Telethon usando as configurações do Pydantic."""
-        self.client = TelegramClient(
-            'promo_engine_session', 
+    def __init__(self, client=None, shard: Optional[Tuple[int, int]] = None, session: str = None):
+        """
+        Inicializa o cliente Telethon usando as configurações do Pydantic.
+        Um cliente alternativo (ex.: o falso do bench) pode ser injetado.
+        `shard=(índice, total)` liga o modo particionado: sessão própria, apenas os
+        canais da partição e deduplicação compartilhada com os demais workers.
+        `session` troca o arquivo de sessão (ex.: o backfill, que roda ao lado do serve).
+        """
+        self.shard_index, self.shard_count = shard or (0, 1)
+        sharded = self.shard_count > 1
+        self.name = f"bot-{self.shard_index}" if sharded else "bot"
+        self.client = client or TelegramClient(
+            session or (f'promo_engine_session_{self.shard_index}' if sharded else 'promo_engine_session'),
             settings.API_ID, 
             settings.API_HASH
         )
+        self.filters = FilterCache(shard=shard if sharded else None)
+        self.writer = PromoWriter()
+        self.dedup = Deduplicator(shared=SharedClaimStore(self.shard_index) if sharded else None)
+        self.forwarder = Forwarder(self.client, worker=self.shard_index, workers=self.shard_count)
+        # A retenção é do banco inteiro: basta um worker executá-la
+        self.retention = RetentionScheduler() if self.shard_index == 0 else None
+        self._subscription: Optional[events.NewMessage] = None
+        self._subscribed_channels: FrozenSet[str] = frozenset()
+
+    @property
+    def phone(self) -> str:
+        """Conta usada por este worker (uma por partição, se SHARD_PHONE_NUMBERS estiver definido)."""
+        phones = settings.SHARD_PHONE_NUMBERS
+        return phones[self.shard_index % len(phones)] if phones else settings.PHONE_NUMBER
 
     def generate_id(self, text: str) -> str:
         """Gera um hash MD5 único para evitar duplicidade de ofertas."""
-        return hashlib.md5(text.encode()).hexdigest()
+        return Deduplicator.generate_id(text)
 
     def extract_price(self, text: str) -> float:
-        """Extrai preços no formato R$ 0,00 ou R$0.00."""
-        try:
-            match = re.search(r'R\$\s?(\d{1,3}(?:\.\d{3})*,\d{2})', text)
-            if match:
-                return float(match.group(1).replace('.', '').replace(',', '.'))
-        except Exception as e:
-            logger.debug(f"Falha ao extrair preço: {e}")
-        return 0.0
+        """Extrai o preço atual da oferta (ver core.extraction)."""
+        return extractor.scan(text)["preco"]
 
     def extract_link(self, text: str) -> str:
-        """Extrai a primeira URL encontrada na mensagem."""
+        """Extrai o link canônico da oferta (ver core.extraction)."""
+        return extractor.scan(text)["link"]
+
+    def register_metrics(self):
+        """Gauges lidos sob demanda; registrados só no processo que roda o bot."""
+        QUEUE_DEPTH.set_function(lambda: self.writer.depth, queue="writer")
+        QUEUE_DEPTH.set_function(self.forwarder.pending_count, queue="forward")
+        CACHE_ENTRIES.set_function(lambda: len(self.dedup.exact), cache="dedup_exact")
+        CACHE_ENTRIES.set_function(lambda: len(self.dedup.near), cache="dedup_near")
+
+    async def process_message(self, chat_username: str, msg_text: str, posted_at: datetime = None,
+                              message=None, forward: bool = True) -> str:
+        """
+        Caminho único de ingestão (tempo real, backfill e replay).
+        Retorna 'ignored', 'duplicate', 'near_duplicate', 'stored' ou 'queued'
+        (enviado à fila de encaminhamento).
+        """
         try:
-            url_pattern = r'https?://[^\s]+'
-            urls = re.findall(url_pattern, text)
-            return urls[0] if urls else "Link não encontrado"
-        except:
-            return "Erro na extração de link"
+            result = await self._ingest(chat_username, msg_text, posted_at, message, forward)
+        except Exception:
+            ERRORS.inc(component="bot")
+            raise
+        MESSAGES.inc(result=result)
+        if message is not None and self.filters.get().watches(chat_username):
+            # Tempo real: o próximo backfill retoma do último id que o bot viu (gravado com o lote)
+            self.writer.note_checkpoint(chat_username.lower(), message.id)
+        return result
 
-    async def start(self):
-        """Inicia o ciclo de vida do Bot."""
-        logger.info("🚀 BotWorker: Iniciando escuta nos canais do Telegram...")
+    async def _ingest(self, chat_username: str, msg_text: str, posted_at: datetime,
+                      message, forward: bool) -> str:
+        # 2. Snapshot de Filtros em memória (recompilado só quando o painel salva)
+        # 3. Filtro de Canal
+        with STAGE_SECONDS.time(stage="filter"):
+            filters = self.filters.get()
+            watched = filters.watches(chat_username)
+        if not watched:
+            return "ignored" # Silencioso para canais não monitorados
 
-        @self.client.on(events.NewMessage())
-        async def message_handler(event):
-            # Criamos uma nova sessão de banco para cada thread/evento (Thread-safe)
-            db = SessionLocal()
-            try:
-                # 1. Identificação da Origem
-                chat_username = event.chat.username if hasattr(event.chat, 'username') else "Unknown"
-                
-                # 2. Carga Dinâmica de Filtros do Banco (Clean Code: Sem hardcode)
-                conf = db.query(ConfigModel).first() or ConfigModel()
-                target_channels = [c.strip() for c in conf.channels.split(',')]
-                keywords = [k.strip().lower() for k in conf.keywords.split(',')]
-
-                # 3. Filtro de Canal
-                if chat_username not in target_channels:
-                    return # Silencioso para canais não monitorados
-
-                msg_text = event.message.message
-                if not msg_text:
-                    return
-
-                logger.info(f"📩 Mensagem recebida de: @{chat_username}")
-
-                # 4. Filtro de Duplicidade
-                msg_id = self.generate_id(msg_text)
-                if db.query(PromoModel).filter(PromoModel.id == msg_id).first():
-                    logger.warning(f"♻️ Oferta duplicada ignorada (ID: {msg_id[:8]})")
-                    return
-
-                # 5. Extração de Dados
-                titulo = msg_text.split('\n')[0][:100]
-                preco = self.extract_price(msg_text)
-                link = self.extract_link(msg_text)
-
-                # 6. Persistência no Banco (Dashboard)
-                new_promo = PromoModel(
-                    id=msg_id,
-                    titulo=titulo,
-                    preco=preco,
-                    link=link,
-                    fonte=f"@{chat_username}"
+        if not msg_text:
+            return "ignored"
+
+        logger.info(f"📩 Mensagem recebida de: @{chat_username}")
+
+        # A janela de repostagem corre no tempo da postagem: um backfill/replay de
+        # vários dias processado em minutos não junta ofertas de dias diferentes
+        posted_ts = None
+        if posted_at is not None:
+            if posted_at.tzinfo is None:
+                posted_at = posted_at.replace(tzinfo=timezone.utc)
+            posted_ts = posted_at.timestamp()
+            posted_at = posted_at.astimezone(timezone.utc).replace(tzinfo=None)
+
+        # 4. Filtro de Duplicidade em memória (exata + repostagem entre canais)
+        with STAGE_SECONDS.time(stage="dedup"):
+            dedup = self.dedup.check(msg_text, now=posted_ts)
+        if dedup.is_duplicate:
+            return self._duplicate(dedup)
+
+        # O check já marcou o id como visto: qualquer falha até a gravação desfaz a marca
+        # (cache exato, índice de repostagens e registro compartilhado) para permitir nova tentativa
+        msg_id = dedup.msg_id
+        try:
+            # Modo particionado: o registro compartilhado desempata entre os workers
+            with STAGE_SECONDS.time(stage="claim"):
+                dedup = await self.dedup.claim_shared(dedup, now=posted_ts)
+            if dedup.is_duplicate:
+                return self._duplicate(dedup)
+
+            # 5. Extração de Dados (preços, parcelas, cupom, loja, link canônico)
+            with STAGE_SECONDS.time(stage="extract"):
+                offer = extractor.extract(msg_text, f"@{chat_username}", msg_id, posted_at)
+            titulo = offer.titulo
+
+            # 6. Persistência em Lote (Dashboard); o ON CONFLICT cobre ids que já saíram do cache
+            # Inclui a espera na fila + o commit do lote em que a linha entrou
+            with STAGE_SECONDS.time(stage="store"):
+                inserted = await self.writer.store({
+                    **offer.model_dump(),
+                    "mensagem": msg_text,
+                    "data_captura": datetime.utcnow(),
+                })
+        except Exception:
+            self.dedup.forget(msg_id)
+            raise
+        if not inserted:
+            logger.warning(f"♻️ Oferta duplicada ignorada (ID: {msg_id[:8]})")
+            return "duplicate"
+        logger.info(f"📥 Salva no Dashboard: {titulo[:30]}...")
+
+        # 7. Filtro de Palavras-Chave e Encaminhamento Privado (fila com rate limit, fora do handler)
+        with STAGE_SECONDS.time(stage="keywords"):
+            match_keyword = filters.matcher.search(msg_text)
+        if match_keyword and forward:
+            logger.info(f"🔥 MATCH! Palavra-chave encontrada: {match_keyword}")
+            with STAGE_SECONDS.time(stage="forward"):
+                await self.forwarder.enqueue(
+                    promo_id=msg_id, fonte=offer.fonte, keyword=match_keyword,
+                    priority=compute_priority(filters.matcher.weight(match_keyword), offer.preco, offer.preco_original),
+                    titulo=titulo, preco=offer.preco, link=offer.link, texto=msg_text, message=message,
                 )
-                db.add(new_promo)
-                db.commit()
-                logger.info(f"📥 Salva no Dashboard: {titulo[:30]}...")
-
-                # 7. Filtro de Palavras-Chave e Encaminhamento Privado
-                match_keywords = [kw for kw in keywords if kw and kw in msg_text.lower()]
-                if match_keywords:
-                    logger.info(f"🔥 MATCH! Palavra-chave encontrada: {match_keywords[0]}")
-                    await self.client.send_message(
-                        settings.MY_PRIVATE_GROUP_ID, 
-                        event.message
-                    )
-                    logger.info(f"🚀 Encaminhada para o Grupo Privado.")
-                else:
-                    logger.debug("📌 Sem palavras-chave de interesse. Apenas armazenada.")
+            return "queued"
+        logger.debug("📌 Sem palavras-chave de interesse (ou encaminhamento desligado). Apenas armazenada.")
+        return "stored"
 
+    @staticmethod
+    def _duplicate(dedup) -> str:
+        if dedup.kind == "near":
+            logger.warning(f"♻️ Repostagem ignorada (ID: {dedup.msg_id[:8]} ≈ {dedup.original_id[:8]})")
+            return "near_duplicate"
+        logger.warning(f"♻️ Oferta duplicada ignorada (ID: {dedup.msg_id[:8]})")
+        return "duplicate"
+
+    async def message_handler(self, event) -> str:
+        """Handler de events.NewMessage; retorna o resultado do processamento ('error' em falha)."""
+        try:
+            # 1. Identificação da Origem
+            chat_username = event.chat.username if hasattr(event.chat, 'username') else "Unknown"
+            return await self.process_message(
+                chat_username, event.message.message, event.message.date, event.message
+            )
+        except Exception as e:
+            logger.error(f"❌ Erro no BotWorker: {e}", exc_info=True)
+            return "error"
+
+    async def subscribe(self, snapshot: FilterSnapshot) -> List[str]:
+        """
+        Registra o handler apenas para os canais monitorados, de modo que o
+        Telethon descarte as demais conversas antes de chegar ao Python.
+        Retorna os canais que não puderam ser resolvidos.
+        """
+        peer_ids, missing = [], []
+        for channel in sorted(snapshot.channels):
+            try:
+                peer_ids.append(await self.client.get_peer_id(channel))
             except Exception as e:
-                logger.error(f"❌ Erro no BotWorker: {e}", exc_info=True)
-            finally:
-                db.close()
-
-        # Inicia a conexão oficial
-        await self.client.start(phone=settings.PHONE_NUMBER)
-        logger.info("✅ Conexão estabelecida com o Telegram.")
-        await self.client.run_until_disconnected()
+                missing.append(channel)
+                logger.warning(f"⚠️ Canal @{channel} não resolvido: {e}")
+
+        # Troca sem await no meio: nenhum update é despachado entre a remoção e o novo registro
+        if self._subscription is not None:
+            self.client.remove_event_handler(self.message_handler, self._subscription)
+            self._subscription = None
+        if peer_ids:
+            # chats=[] equivaleria a "todas as conversas", por isso só registra com ao menos um canal
+            self._subscription = events.NewMessage(chats=peer_ids)
+            self.client.add_event_handler(self.message_handler, self._subscription)
+        self._subscribed_channels = snapshot.channels
+        logger.info(f"👂 {self.name}: escutando {len(peer_ids)} canais (versão {snapshot.version} dos filtros).")
+        return missing
+
+    async def _watch_subscription(self, missing: List[str]):
+        """Refaz a inscrição quando o painel muda os canais ou há canais pendentes de resolução."""
+        retry_at = time.monotonic() + settings.CHANNEL_RESOLVE_RETRY_SECONDS
+        while True:
+            await asyncio.sleep(self.filters.refresh_interval or 2.0)
+            try:
+                snapshot = self.filters.get()
+                retry = bool(missing) and time.monotonic() >= retry_at
+                if snapshot.channels != self._subscribed_channels or retry:
+                    missing = await self.subscribe(snapshot)
+                    retry_at = time.monotonic() + settings.CHANNEL_RESOLVE_RETRY_SECONDS
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Falha ao atualizar a inscrição de canais: {e}", exc_info=True)
+
+    async def start(self):
+        """Inicia o ciclo de vida do Bot."""
+        logger.info(f"🚀 BotWorker ({self.name}): Iniciando escuta nos canais do Telegram...")
+
+        self.dedup.warm_up()
+        self.writer.start()
+        self.register_metrics()
+        loop = asyncio.get_running_loop()
+        background = [loop.create_task(run_exporter(self.name), name="metrics-exporter")]
+        try:
+            # Inicia a conexão oficial
+            await self.client.start(phone=self.phone)
+            logger.info("✅ Conexão estabelecida com o Telegram.")
+            missing = await self.subscribe(self.filters.get())
+            background.append(loop.create_task(self._watch_subscription(missing), name="channel-subscription"))
+            self.forwarder.start()
+            if self.retention is not None:
+                self.retention.start()
+            await self.client.run_until_disconnected()
+        finally:
+            # Garante que nenhuma oferta enfileirada se perca no encerramento
+            for task in background:
+                task.cancel()
+            if self.retention is not None:
+                await self.retention.stop()
+            await self.forwarder.stop()
+            await self.writer.stop()
+            if self.dedup.shared is not None:
+                self.dedup.shared.close()
+
+    async def stop(self):
+        """Desconecta do Telegram; o start() drena a fila de escrita ao retornar."""
+        logger.info("🛑 BotWorker: Encerrando...")
+        await self.client.disconnect()
 
 # Instância exportada para o run.py
 bot_worker = PromotionBot()
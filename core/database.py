@@ -1,7 +1,10 @@
 import logging
-from sqlalchemy import Column, String, Float, DateTime, create_engine, delete
+from sqlalchemy import Column, String, Float, Integer, DateTime, Text, Index, create_engine, event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from datetime import datetime, timedelta
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from datetime import datetime
 from config import settings
 
 logger = logging.getLogger("DatabaseModule")
@@ -15,44 +18,210 @@ class PromoModel(Base):
     preco = Column(Float)
     link = Column(String)
     fonte = Column(String)
+    preco_original = Column(Float)
+    parcelas = Column(Integer)
+    valor_parcela = Column(Float)
+    loja = Column(String)
+    cupom = Column(String)
+    imagem_url = Column(String)
+    data_postagem = Column(DateTime)  # Data da mensagem no Telegram (data_captura = chegada no bot)
+    mensagem = Column(Text)  # Texto completo da mensagem, indexado pela busca FTS5
     data_captura = Column(DateTime, default=datetime.utcnow)
 
+    # Índice composto usado pela ordenação/paginação por cursor (data_captura, id)
+    __table_args__ = (Index("ix_promotions_captura_id", "data_captura", "id"),)
+
 class ConfigModel(Base):
     """Configurações dinâmicas de filtros e canais."""
     __tablename__ = "system_configs"
     id = Column(String, primary_key=True, default="global")
     keywords = Column(String, default="iphone,celular,cupom")
     channels = Column(String, default="gafanhotopromocoes,pelando,cupomonline")
+    # Incrementado a cada salvamento no painel; o bot só recompila os filtros quando muda
+    version = Column(Integer, default=0, nullable=False, server_default="0")
+
+class ForwardQueueModel(Base):
+    """Fila persistente de encaminhamentos para o grupo privado (sobrevive a reinícios)."""
+    __tablename__ = "forward_queue"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    promo_id = Column(String, index=True)
+    fonte = Column(String)
+    source_message_id = Column(Integer)
+    keyword = Column(String)
+    priority = Column(Float, default=0.0)
+    titulo = Column(String)
+    preco = Column(Float)
+    link = Column(String)
+    texto = Column(Text)
+    status = Column(String, default="pending")  # pending | sent | failed
+    worker = Column(Integer, default=0, nullable=False, server_default="0")  # Worker que enfileirou (modo particionado)
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    last_error = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime)
+
+    __table_args__ = (Index("ix_forward_queue_due", "status", "priority", "next_attempt_at"),)
+
+class DedupClaimModel(Base):
+    """
+    Registro compartilhado de ofertas aceitas pelos workers do modo particionado.
+    As 4 bandas de 16 bits do SimHash são indexadas para achar repostagens
+    feitas em canais de outro worker sem varrer a tabela.
+    """
+    __tablename__ = "dedup_claims"
+    msg_id = Column(String, primary_key=True)
+    simhash = Column(Integer)  # 64 bits com sinal (o INTEGER do SQLite é signed)
+    numbers = Column(String)
+    band0 = Column(Integer, index=True)
+    band1 = Column(Integer, index=True)
+    band2 = Column(Integer, index=True)
+    band3 = Column(Integer, index=True)
+    worker = Column(Integer)
+    claimed_at = Column(Float, index=True)  # Epoch, para a janela de tempo e a limpeza
+
+class DataVersionModel(Base):
+    """
+    Contador de alterações por tabela. Incrementado na mesma transação de toda
+    escrita em `promotions` (writer, reprocessamento e retenção); o dashboard
+    usa o valor como ETag/chave de cache da página inicial.
+    """
+    __tablename__ = "data_versions"
+    name = Column(String, primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
+
+class ChannelCheckpointModel(Base):
+    """Último id de mensagem processado por canal (retomada do backfill)."""
+    __tablename__ = "channel_checkpoints"
+    channel = Column(String, primary_key=True)
+    last_message_id = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+_BUMP_PROMOTIONS_VERSION = text(
+    "INSERT INTO data_versions (name, version) VALUES ('promotions', 1) "
+    "ON CONFLICT(name) DO UPDATE SET version = version + 1"
+)
 
-# Configuração de Engine
+def mark_promotions_changed(conn):
+    """Incrementa a versão de `promotions` (Session ou Connection, antes do commit)."""
+    conn.execute(_BUMP_PROMOTIONS_VERSION)
+
+def _set_sqlite_pragmas(dbapi_connection, _record):
+    """
+    Aplicado a cada nova conexão (síncrona ou assíncrona).
+    WAL permite que o dashboard leia enquanto o bot grava; busy_timeout faz a
+    conexão esperar pelo lock em vez de falhar com "database is locked".
+    auto_vacuum precisa vir antes do WAL: só vale para bancos novos (ou após um VACUUM).
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={settings.DB_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+def _async_url(url: str) -> str:
+    """Converte a URL síncrona (sqlite://) para o driver aiosqlite."""
+    parsed = make_url(url)
+    return str(parsed.set(drivername="sqlite+aiosqlite")) if parsed.drivername == "sqlite" else url
+
+# Configuração de Engine (bot, scripts e manutenção)
 engine = create_engine(settings.DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+event.listen(engine, "connect", _set_sqlite_pragmas)
+
+# Engine assíncrona (dashboard FastAPI): não bloqueia o event loop do uvicorn
+async_engine = create_async_engine(
+    _async_url(settings.DATABASE_URL),
+    # O padrão do aiosqlite é NullPool (uma conexão nova por requisição); reaproveitamos conexões
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_POOL_OVERFLOW,
+    pool_pre_ping=True,
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
 
-def cleanup_old_promos(days: int = 7):
+def _migrate_columns():
     """
-    Remove promoções mais antigas que o limite de dias especificado.
-    Motivo: Manter a performance do SQLite e do Dashboard Web.
+    Adiciona colunas novas em tabelas já existentes.
+    Motivo: create_all não altera tabelas criadas por versões anteriores.
     """
-    db = SessionLocal()
-    try:
-        limit_date = datetime.utcnow() - timedelta(days=days)
-        stmt = delete(PromoModel).where(PromoModel.data_captura < limit_date)
-        result = db.execute(stmt)
-        db.commit()
-        if result.rowcount > 0:
-            logger.info(f"🧹 Limpeza: {result.rowcount} ofertas antigas removidas do banco.")
-    except Exception as e:
-        logger.error(f"❌ Erro na limpeza do banco: {e}")
-        db.rollback()
-    finally:
-        db.close()
+    inspector = inspect(engine)
+    existing_tables = inspector.get_table_names()
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present:
+                    continue
+                ddl = column.type.compile(dialect=engine.dialect)
+                if column.server_default is not None:
+                    ddl += f" DEFAULT {column.server_default.arg}"
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {ddl}'))
+                logger.info(f"🛠️ Migração: coluna {table.name}.{column.name} adicionada.")
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+# Busca textual: tabela FTS5 de conteúdo externo espelhando `promotions` via triggers.
+# remove_diacritics 2 faz "camera" encontrar "câmera"; o rank padrão pondera título > fonte > mensagem.
+FTS_TABLE = "promotions_fts"
+_FTS_DDL = [
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        titulo, mensagem, fonte,
+        content='promotions', content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS promotions_fts_ai AFTER INSERT ON promotions BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, titulo, mensagem, fonte)
+        VALUES (new.rowid, new.titulo, new.mensagem, new.fonte);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS promotions_fts_ad AFTER DELETE ON promotions BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, titulo, mensagem, fonte)
+        VALUES ('delete', old.rowid, old.titulo, old.mensagem, old.fonte);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS promotions_fts_au AFTER UPDATE ON promotions BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, titulo, mensagem, fonte)
+        VALUES ('delete', old.rowid, old.titulo, old.mensagem, old.fonte);
+        INSERT INTO {FTS_TABLE}(rowid, titulo, mensagem, fonte)
+        VALUES (new.rowid, new.titulo, new.mensagem, new.fonte);
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', 'bm25(10.0, 1.0, 2.0)')",
+]
+
+def rebuild_search_index():
+    """
+    Reconstrói o índice FTS5 a partir da tabela `promotions`.
+    Necessário após um VACUUM completo, que pode renumerar os rowids.
+    """
+    with engine.begin() as conn:
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    logger.info("🔎 Índice de busca reconstruído.")
+
+def _ensure_search_index():
+    """Cria a tabela FTS5 e os triggers de sincronização, indexando o histórico existente."""
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+        ).first()
+        if exists:
+            return
+        for ddl in _FTS_DDL:
+            conn.execute(text(ddl))
+    rebuild_search_index()
 
 def init_db():
-    """Inicializa tabelas e executa rotina de manutenção."""
+    """
+    Inicializa tabelas e índices.
+    A retenção não roda mais aqui: core.retention apaga em lotes, em segundo plano.
+    """
     try:
         Base.metadata.create_all(bind=engine)
+        _migrate_columns()
+        _ensure_search_index()
         logger.info("🗄️ Tabelas verificadas/inicializadas.")
-        cleanup_old_promos() # Roda a limpeza no boot
     except Exception as e:
         logger.error(f"❌ Falha no init_db: {e}")
 
@@ -0,0 +1,366 @@
+import asyncio
+import hashlib
+import logging
+import re
+import sqlite3
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+from config import settings
+from core.database import SessionLocal, PromoModel, engine
+from core.extraction import canonical_link
+from core.filters import fold_text
+
+# Docstring: O motivo desta lógica existir é barrar ofertas repetidas antes de
+# qualquer acesso ao SQLite. Um cache LRU de hashes exatos cobre as repetições
+# literais e um índice SimHash com janela de tempo colapsa a mesma oferta
+# repostada por canais diferentes (emojis, textos de chamada ou parâmetros de
+# rastreio diferentes), com custo constante por mensagem. A assinatura usa só
+# o que identifica a oferta (link canônico, termos do produto e números):
+# cabeçalhos, chamadas e palavras de enchimento ficam de fora.
+logger = logging.getLogger("DedupEngine")
+
+URL_RE = re.compile(r'https?://[^\s]+')
+WORD_RE = re.compile(r'[a-z0-9]+(?:[.,][0-9]+)*')
+NUMBER_RE = re.compile(r'\d+(?:[.,]\d+)*')
+
+SIMHASH_BITS = 64
+_BANDS = 4
+_BAND_BITS = SIMHASH_BITS // _BANDS
+_BAND_MASK = (1 << _BAND_BITS) - 1
+_HASH_MASK = (1 << SIMHASH_BITS) - 1
+
+# Vocabulário de chamada dos canais (cabeçalhos, CTAs, enchimento e conectivos).
+# Já sem acento, como sai do fold_text; não identifica a oferta e varia entre repostagens
+BOILERPLATE_WORDS = frozenset("""
+    a ao aos as ate com da das de do dos e em na nas no nos o os ou para pelo pela por pra so sem um uma
+    r x gb tb cm
+    corre corra correee baixou caiu preco precao precinho menor historico oferta ofertas promo promocao
+    promocoes relampago olha isso imperdivel aproveite urgente achado achadinho bug erro queima
+    liquidacao desconto descontos cupom cupons codigo off
+    compre comprar aqui link clique confira garanta garantir seu sua veja acesse
+    frete gratis prime cashback estoque limitado limitada hoje agora apenas juros vista parcelado
+    """.split())
+
+
+def normalize_message(text: str) -> Tuple[List[str], List[str]]:
+    """Separa o texto em tokens normalizados (sem acento/emoji) e links canônicos."""
+    links = [canonical_link(u) for u in URL_RE.findall(text)]
+    body = fold_text(URL_RE.sub(" ", text))
+    return WORD_RE.findall(body), links
+
+
+def _feature_hash(feature: str) -> int:
+    # blake2b é estável entre processos (ao contrário de hash()), o que permite compartilhar o índice
+    return int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "big")
+
+
+def simhash(features: Dict[str, int]) -> int:
+    """Calcula o SimHash de 64 bits de um conjunto de features com peso."""
+    rows = []
+    for feature, weight in features.items():
+        rows.extend([format(_feature_hash(feature), "064b")] * weight)
+    if not rows:
+        return 0
+    # Transpõe as strings binárias e conta os '1' por coluna em C (zip + tuple.count),
+    # em vez de um laço Python de 64 iterações por feature
+    half = len(rows) / 2
+    bits = "".join("1" if column.count("1") > half else "0" for column in zip(*rows))
+    return int(bits, 2)
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    """Assinatura de uma mensagem para detecção de quase-duplicatas."""
+    simhash: int
+    numbers: str  # Preços/percentuais precisam bater exatamente para colapsar
+
+
+def fingerprint(text: str) -> Fingerprint:
+    tokens, links = normalize_message(text)
+    content = [t for t in tokens if t not in BOILERPLATE_WORDS and (len(t) > 1 or t.isdigit())]
+    features: Dict[str, int] = dict.fromkeys(content, 1)
+    features.update(dict.fromkeys((f"{a} {b}" for a, b in zip(content, content[1:])), 1))
+    # O link canônico (sem afiliado) ancora metade do peso: o texto ao redor muda
+    # entre canais, o produto apontado não
+    for link in set(links):
+        features[f"link:{link}"] = max(1, len(features) // len(set(links)))
+    numbers = sorted(set(NUMBER_RE.findall(fold_text(URL_RE.sub(" ", text)))))
+    return Fingerprint(simhash(features), "|".join(numbers))
+
+
+@dataclass(frozen=True)
+class DedupResult:
+    """Resultado da verificação: 'new', 'exact' ou 'near'."""
+    kind: str
+    msg_id: str
+    original_id: Optional[str] = None
+    fingerprint: Optional[Fingerprint] = field(default=None, repr=False, compare=False)
+
+    @property
+    def is_duplicate(self) -> bool:
+        return self.kind != "new"
+
+
+class ExactCache:
+    """Conjunto LRU limitado de ids (hash MD5 do texto) já vistos."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items: "OrderedDict[str, None]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, msg_id: str) -> bool:
+        if msg_id in self._items:
+            self._items.move_to_end(msg_id)
+            return True
+        return False
+
+    def add(self, msg_id: str):
+        self._items[msg_id] = None
+        self._items.move_to_end(msg_id)
+        if len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def discard(self, msg_id: str):
+        self._items.pop(msg_id, None)
+
+
+class NearDuplicateIndex:
+    """
+    Índice SimHash por bandas (LSH) com janela deslizante de tempo.
+    Motivo: dividir os 64 bits em 4 bandas garante, pelo princípio da casa dos
+    pombos, que assinaturas a até 3 bits de distância compartilhem uma banda;
+    assim cada consulta olha só alguns buckets em vez do histórico inteiro.
+    """
+
+    def __init__(self, window_seconds: float, max_distance: int, max_entries: int):
+        self.window_seconds = window_seconds
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self._buckets: Dict[Tuple[int, int], List[Tuple[Fingerprint, str, float]]] = {}
+        self._timeline: Deque[Tuple[float, Fingerprint, str]] = deque()
+        # Backfill/replay desligam a expiração por tempo: com canais paginados em
+        # paralelo, um canal adiantado expulsaria as entradas recentes dos outros.
+        # Aí só max_entries limita o índice e o find() aplica a janela nos dois sentidos
+        self.evict_by_time = True
+
+    def __len__(self) -> int:
+        return len(self._timeline)
+
+    @staticmethod
+    def _bands(value: int) -> Iterable[Tuple[int, int]]:
+        for band in range(_BANDS):
+            yield band, (value >> (band * _BAND_BITS)) & _BAND_MASK
+
+    def _expire(self, now: float):
+        limit = now - self.window_seconds if self.evict_by_time else float("-inf")
+        while self._timeline and (self._timeline[0][0] < limit or len(self._timeline) > self.max_entries):
+            ts, fp, msg_id = self._timeline.popleft()
+            for key in self._bands(fp.simhash):
+                bucket = self._buckets.get(key)
+                if not bucket:
+                    continue
+                bucket[:] = [entry for entry in bucket if entry[1] != msg_id]
+                if not bucket:
+                    del self._buckets[key]
+
+    def find(self, fp: Fingerprint, now: float, own_id: str = None) -> Optional[str]:
+        self._expire(now)
+        for key in self._bands(fp.simhash):
+            for other, msg_id, ts in self._buckets.get(key, ()):
+                # Janela simétrica: no backfill, canais em paralelo chegam fora de ordem
+                if abs(now - ts) <= self.window_seconds and msg_id != own_id and other.numbers == fp.numbers and bin(other.simhash ^ fp.simhash).count("1") <= self.max_distance:
+                    return msg_id
+        return None
+
+    def add(self, fp: Fingerprint, msg_id: str, now: float):
+        self._timeline.append((now, fp, msg_id))
+        for key in self._bands(fp.simhash):
+            self._buckets.setdefault(key, []).append((fp, msg_id, now))
+
+    def discard(self, msg_id: str):
+        """Remove uma entrada (caminho raro: falha na gravação), varrendo a linha do tempo."""
+        entries = [entry for entry in self._timeline if entry[2] == msg_id]
+        if not entries:
+            return
+        self._timeline = deque(entry for entry in self._timeline if entry[2] != msg_id)
+        for _, fp, _ in entries:
+            for key in self._bands(fp.simhash):
+                bucket = self._buckets.get(key)
+                if not bucket:
+                    continue
+                bucket[:] = [entry for entry in bucket if entry[1] != msg_id]
+                if not bucket:
+                    del self._buckets[key]
+
+
+class SharedClaimStore:
+    """
+    Registro de deduplicação compartilhado entre os workers do modo particionado
+    (tabela dedup_claims no mesmo SQLite). Cada worker só enxerga os próprios
+    canais na memória; antes de gravar, a oferta é "reivindicada" aqui dentro de
+    uma transação BEGIN IMMEDIATE, que serializa os workers: das cópias de uma
+    mesma oferta (literal ou repostagem) só a primeira é gravada e encaminhada.
+    """
+
+    _PURGE_EVERY = 1000
+
+    def __init__(self, worker: int, window_seconds: float = None, max_distance: int = None):
+        self.worker = worker
+        self.window_seconds = window_seconds or settings.DEDUP_NEAR_WINDOW_MINUTES * 60
+        self.max_distance = settings.DEDUP_NEAR_MAX_DISTANCE if max_distance is None else max_distance
+        # Conexão própria (autocommit) em uma única thread, para controlar o BEGIN IMMEDIATE
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="SharedClaims")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._claims = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(
+                engine.url.database, timeout=settings.DB_BUSY_TIMEOUT_MS / 1000, isolation_level=None
+            )
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        return self._conn
+
+    async def claim(self, result: DedupResult, now: float = None) -> DedupResult:
+        now = time.time() if now is None else now
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._claim, result, now)
+
+    def release(self, msg_id: str):
+        """Desfaz uma reivindicação (ex.: falha na gravação); não bloqueia o chamador."""
+        self._executor.submit(self._release, msg_id)
+
+    def _claim(self, result: DedupResult, now: float) -> DedupResult:
+        conn = self._connect()
+        fp = result.fingerprint
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM dedup_claims WHERE msg_id = ?", (result.msg_id,)).fetchone():
+                conn.execute("ROLLBACK")
+                return DedupResult("exact", result.msg_id, result.msg_id)
+            bands = [value for _, value in NearDuplicateIndex._bands(fp.simhash)] if fp else [None] * _BANDS
+            if fp is not None:
+                candidates = conn.execute(
+                    "SELECT msg_id, simhash FROM dedup_claims "
+                    "WHERE (band0 = ? OR band1 = ? OR band2 = ? OR band3 = ?) AND numbers = ? "
+                    "AND claimed_at BETWEEN ? AND ?",
+                    (*bands, fp.numbers, now - self.window_seconds, now + self.window_seconds),
+                ).fetchall()
+                for other_id, other_hash in candidates:
+                    if bin((other_hash ^ fp.simhash) & _HASH_MASK).count("1") <= self.max_distance:
+                        conn.execute("ROLLBACK")
+                        return DedupResult("near", result.msg_id, other_id)
+            signed = None
+            if fp is not None:
+                signed = fp.simhash - (1 << SIMHASH_BITS) if fp.simhash >> (SIMHASH_BITS - 1) else fp.simhash
+            conn.execute(
+                "INSERT INTO dedup_claims (msg_id, simhash, numbers, band0, band1, band2, band3, worker, claimed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (result.msg_id, signed, fp.numbers if fp else None, *bands, self.worker, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        self._claims += 1
+        if self._claims % self._PURGE_EVERY == 0:
+            conn.execute("DELETE FROM dedup_claims WHERE claimed_at < ?", (now - self.window_seconds,))
+        return result
+
+    def _release(self, msg_id: str):
+        try:
+            self._connect().execute("DELETE FROM dedup_claims WHERE msg_id = ?", (msg_id,))
+        except Exception as e:
+            logger.error(f"❌ Falha ao liberar reivindicação {msg_id[:8]}: {e}")
+
+    def _close_connection(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def close(self):
+        # A conexão pertence à thread do executor: é fechada lá antes do shutdown
+        self._executor.submit(self._close_connection)
+        self._executor.shutdown(wait=True)
+
+
+class Deduplicator:
+    """Camada de deduplicação usada pelo BotWorker antes de enfileirar a gravação."""
+
+    def __init__(self, cache_size: int = None, near_enabled: bool = None, shared: SharedClaimStore = None):
+        self.exact = ExactCache(cache_size or settings.DEDUP_CACHE_SIZE)
+        self.near_enabled = settings.DEDUP_NEAR_ENABLED if near_enabled is None else near_enabled
+        self.near = NearDuplicateIndex(
+            window_seconds=settings.DEDUP_NEAR_WINDOW_MINUTES * 60,
+            max_distance=settings.DEDUP_NEAR_MAX_DISTANCE,
+            max_entries=self.exact.max_size,
+        )
+        self.shared = shared
+
+    @staticmethod
+    def generate_id(text: str) -> str:
+        """Gera um hash MD5 único para evitar duplicidade de ofertas."""
+        return hashlib.md5(text.encode()).hexdigest()
+
+    def warm_up(self):
+        """Carrega no cache os ids mais recentes do banco (executado no boot)."""
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(PromoModel.id)
+                .order_by(PromoModel.data_captura.desc())
+                .limit(self.exact.max_size)
+                .all()
+            )
+            # Do mais antigo para o mais novo, para que os recentes fiquem no topo do LRU
+            for (msg_id,) in reversed(rows):
+                self.exact.add(msg_id)
+            logger.info(f"🧠 Cache de deduplicação aquecido com {len(rows)} ids.")
+        except Exception as e:
+            logger.error(f"❌ Falha ao aquecer cache de deduplicação: {e}")
+        finally:
+            db.close()
+
+    def check(self, text: str, now: float = None) -> DedupResult:
+        """
+        Verifica e já registra a mensagem (check-and-set síncrono, sem await no meio,
+        para que dois handlers concorrentes não deixem passar a mesma oferta).
+        `now` é o instante da postagem (epoch); sem ele, o relógio local.
+        """
+        now = time.time() if now is None else now
+        msg_id = self.generate_id(text)
+        if msg_id in self.exact:
+            return DedupResult("exact", msg_id, msg_id)
+
+        if self.near_enabled:
+            fp = fingerprint(text)
+            original = self.near.find(fp, now, own_id=msg_id)
+            if original is not None:
+                self.exact.add(msg_id)
+                return DedupResult("near", msg_id, original)
+            self.near.add(fp, msg_id, now)
+        else:
+            fp = None
+
+        self.exact.add(msg_id)
+        return DedupResult("new", msg_id, fingerprint=fp)
+
+    async def claim_shared(self, result: DedupResult, now: float = None) -> DedupResult:
+        """Confirma uma oferta nova no registro compartilhado (apenas no modo particionado)."""
+        if self.shared is None or result.is_duplicate:
+            return result
+        return await self.shared.claim(result, now)
+
+    def forget(self, msg_id: str):
+        """Remove um id dos caches (ex.: falha na gravação) para permitir nova tentativa."""
+        self.exact.discard(msg_id)
+        self.near.discard(msg_id)
+        if self.shared is not None:
+            self.shared.release(msg_id)
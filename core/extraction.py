@@ -0,0 +1,236 @@
+import logging
+import re
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from sqlalchemy import text, update
+from core.database import SessionLocal, PromoModel, mark_promotions_changed
+from core.schemas import PromoItem
+
+# Docstring: O motivo desta lógica existir é transformar o texto livre das
+# mensagens em uma oferta estruturada (PromoItem) em uma única varredura.
+# Todos os padrões são pré-compilados no import; a mesma rotina atende o
+# BotWorker (uma mensagem por vez) e o reprocessamento em lote do histórico.
+logger = logging.getLogger("OfferExtractor")
+
+_PRICE = r'\d{1,3}(?:\.\d{3})+(?:,\d{2})?|\d+(?:,\d{2})?'
+
+# Varredura única: cada match é um link, uma parcela, um preço ou um cupom
+TOKEN_RE = re.compile(rf'''
+    (?P<url>https?://[^\s<>"'\])]+)
+  | (?P<inst>(?P<inst_n>\d{{1,2}})\s?[xX]\s?(?:de\s)?R\$\s?(?P<inst_v>{_PRICE}))
+  | (?P<price>R\$\s?(?P<price_v>{_PRICE}))
+  | (?P<coupon>(?i:cupom|cupon|coupon|c[oó]digo)(?i:\s+de\s+desconto)?\s*[:：\-–]?\s*[*_`"'“]*
+        (?P<code>[A-Z0-9][A-Z0-9_\-]{{2,29}})\b)
+''', re.VERBOSE)
+
+# Palavras imediatamente antes do preço que indicam "preço antigo" ou "preço atual"
+OLD_CUE_RE = re.compile(r'(?:(?<!partir )\bde|\bera|\bantes|~~?|❌)\s*:?\s*$', re.IGNORECASE)
+NEW_CUE_RE = re.compile(r'(?:\bpor|\bapenas|\bagora|\bsó|\bsai a|✅|🔥|💰|💵)\s*:?\s*$', re.IGNORECASE)
+_CUE_WINDOW = 14
+
+IMAGE_EXT_RE = re.compile(r'\.(?:jpe?g|png|webp|gif)$', re.IGNORECASE)
+
+# Índice domínio -> loja; subdomínios são resolvidos subindo um rótulo por vez
+STORE_DOMAINS: Dict[str, str] = {
+    "amazon.com.br": "Amazon", "amazon.com": "Amazon", "amzn.to": "Amazon", "a.co": "Amazon",
+    "mercadolivre.com.br": "Mercado Livre", "mercadolivre.com": "Mercado Livre", "mercadolibre.com": "Mercado Livre",
+    "magazineluiza.com.br": "Magalu", "magalu.com": "Magalu", "magalu.com.br": "Magalu",
+    "shopee.com.br": "Shopee", "shp.ee": "Shopee",
+    "aliexpress.com": "AliExpress", "aliexpress.us": "AliExpress",
+    "kabum.com.br": "KaBuM!",
+    "casasbahia.com.br": "Casas Bahia", "pontofrio.com.br": "Ponto", "extra.com.br": "Extra",
+    "americanas.com.br": "Americanas", "submarino.com.br": "Submarino", "shoptime.com.br": "Shoptime",
+    "carrefour.com.br": "Carrefour", "fastshop.com.br": "Fast Shop", "girafa.com.br": "Girafa",
+    "netshoes.com.br": "Netshoes", "centauro.com.br": "Centauro", "nike.com.br": "Nike", "adidas.com.br": "Adidas",
+    "samsung.com": "Samsung", "dell.com": "Dell", "lenovo.com": "Lenovo", "apple.com": "Apple",
+    "terabyteshop.com.br": "Terabyte", "pichau.com.br": "Pichau",
+    "shein.com": "Shein", "temu.com": "Temu", "natura.com.br": "Natura", "boticario.com.br": "O Boticário",
+    "drogasil.com.br": "Drogasil", "drogaraia.com.br": "Droga Raia", "leroymerlin.com.br": "Leroy Merlin",
+}
+
+# Parâmetros de rastreio/afiliado removidos na canonicalização dos links
+TRACKING_PARAMS = frozenset({
+    "fbclid", "gclid", "igshid", "mc_cid", "mc_eid", "ref", "ref_", "tag", "ascsubtag", "linkcode",
+    "camp", "creative", "creativeasin", "affiliate", "aff_id", "affid", "afiliado", "source", "smid",
+    "psc", "spm", "matt_tool", "matt_word", "matt_source", "smtt", "sp_atk", "xptdk", "partner_id",
+    "aff_fcid", "aff_platform", "aff_trace_key", "sk", "terminal_id", "afsmartredirect", "pdp_npi",
+})
+TRACKING_PREFIXES = ("utm_", "pf_rd_", "pd_rd_", "aff_", "af_")
+
+NOT_FOUND_LINK = "Link não encontrado"
+DEFAULT_STORE = "Não identificada"
+
+
+def canonical_link(url: str) -> str:
+    """Remove parâmetros de rastreio/afiliado, fragmento e barra final de uma URL."""
+    try:
+        parts = urlsplit(url.strip().rstrip(").,;!"))
+    except ValueError:
+        return url
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=False)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)
+    ]
+    return urlunsplit((
+        parts.scheme.lower() or "https",
+        parts.netloc.lower().removeprefix("www."),
+        parts.path.rstrip("/"),
+        urlencode(sorted(query)),
+        "",
+    ))
+
+
+def detect_store(url: str) -> Optional[str]:
+    """Resolve a loja pelo domínio (ex.: produto.mercadolivre.com.br -> Mercado Livre)."""
+    try:
+        host = urlsplit(url).hostname or ""
+    except ValueError:
+        return None
+    labels = host.split(".")
+    for i in range(len(labels) - 1):
+        store = STORE_DOMAINS.get(".".join(labels[i:]))
+        if store:
+            return store
+    return None
+
+
+def is_image_link(url: str) -> bool:
+    """Links diretos para imagem (.jpg, .png...) viram imagem_url, não o link da oferta."""
+    try:
+        path = urlsplit(url).path
+    except ValueError:
+        # URL malformada (ex.: "https://[..."): trata como link comum, como canonical_link
+        return False
+    return IMAGE_EXT_RE.search(path) is not None
+
+
+def parse_brl(value: str) -> float:
+    """Converte '1.299,90' em 1299.9."""
+    return float(value.replace(".", "").replace(",", "."))
+
+
+def first_line_title(text: str, limit: int = 100) -> str:
+    """Primeira linha não vazia da mensagem, usada como título."""
+    for line in text.split("\n"):
+        if line.strip():
+            return line.strip()[:limit]
+    return ""
+
+
+class OfferExtractor:
+    """Motor de extração: texto da mensagem -> PromoItem."""
+
+    def scan(self, text: str) -> Dict:
+        """Varre o texto uma única vez e devolve os campos estruturados (sem validação)."""
+        links: List[str] = []
+        images: List[str] = []
+        prices: List[Tuple[float, str]] = []  # (valor, 'old' | 'new' | '')
+        installment: Optional[Tuple[int, float]] = None
+        coupon: Optional[str] = None
+
+        for match in TOKEN_RE.finditer(text):
+            kind = match.lastgroup
+            if kind == "url":
+                url = match.group("url")
+                (images if is_image_link(url) else links).append(url)
+            elif kind == "inst":
+                if installment is None:
+                    installment = (int(match.group("inst_n")), parse_brl(match.group("inst_v")))
+            elif kind == "price":
+                before = text[max(0, match.start() - _CUE_WINDOW):match.start()]
+                cue = "old" if OLD_CUE_RE.search(before) else "new" if NEW_CUE_RE.search(before) else ""
+                prices.append((parse_brl(match.group("price_v")), cue))
+            elif kind == "coupon" and coupon is None:
+                coupon = match.group("code")
+
+        preco, preco_original = self._pick_prices(prices)
+        if preco is None and installment:
+            preco = round(installment[0] * installment[1], 2)
+
+        loja = next((store for store in map(detect_store, links) if store), None)
+        return {
+            "titulo": first_line_title(text),
+            "preco": preco if preco is not None else 0.0,
+            "preco_original": preco_original,
+            "parcelas": installment[0] if installment else None,
+            "valor_parcela": installment[1] if installment else None,
+            "link": canonical_link(links[0]) if links else NOT_FOUND_LINK,
+            "loja": loja or DEFAULT_STORE,
+            "cupom": coupon,
+            "imagem_url": images[0] if images else None,
+        }
+
+    @staticmethod
+    def _pick_prices(prices: List[Tuple[float, str]]) -> Tuple[Optional[float], Optional[float]]:
+        """Escolhe preço atual e preço antigo a partir das pistas textuais ("de ... por ...")."""
+        if not prices:
+            return None, None
+        new = next((value for value, cue in prices if cue == "new"), None)
+        if new is None:
+            new = next((value for value, cue in prices if cue != "old"), None)
+        old = next((value for value, cue in prices if cue == "old"), None)
+        if new is None:
+            # Só há preços marcados como "de": o último é o mais provável preço final
+            new, old = prices[-1][0], (prices[0][0] if len(prices) > 1 else None)
+        if old is not None and old <= new:
+            old = None
+        return new, old
+
+    def extract(self, text: str, fonte: str, msg_id: str, posted_at: Optional[datetime] = None) -> PromoItem:
+        """Extrai uma oferta completa de uma mensagem."""
+        fields = self.scan(text)
+        if posted_at is not None:
+            fields["data_postagem"] = posted_at
+        return PromoItem(id=msg_id, fonte=fonte, **fields)
+
+    def extract_batch(self, messages: Iterable[Tuple[str, str, str, Optional[datetime]]]) -> Iterator[PromoItem]:
+        """Versão em lote: recebe tuplas (texto, fonte, id, data_postagem)."""
+        for msg, fonte, msg_id, posted_at in messages:
+            yield self.extract(msg, fonte, msg_id, posted_at)
+
+
+extractor = OfferExtractor()
+
+# Campos que o reprocessamento pode reescrever (data_postagem e fonte vêm da captura)
+_REPARSE_PAGE = text(
+    "SELECT rowid, id, mensagem FROM promotions WHERE rowid > :last ORDER BY rowid LIMIT :limit"
+)
+REPARSE_FIELDS = ("titulo", "preco", "preco_original", "parcelas", "valor_parcela", "link", "loja", "cupom", "imagem_url")
+
+
+def reparse_history(batch_size: int = 2000) -> int:
+    """
+    Reaplica as regras de extração sobre o texto salvo de todas as ofertas.
+    Percorre a tabela por rowid em lotes e grava com UPDATE em massa por chave primária.
+    """
+    db = SessionLocal()
+    updated = 0
+    last_rowid = 0
+    try:
+        while True:
+            rows = db.execute(_REPARSE_PAGE, {"last": last_rowid, "limit": batch_size}).all()
+            if not rows:
+                break
+            changes = []
+            for rowid, msg_id, mensagem in rows:
+                if mensagem:
+                    fields = extractor.scan(mensagem)
+                    changes.append({"id": msg_id, **{k: fields[k] for k in REPARSE_FIELDS}})
+            if changes:
+                db.execute(update(PromoModel), changes)
+                mark_promotions_changed(db)
+                db.commit()
+                updated += len(changes)
+            last_rowid = rows[-1][0]
+        logger.info(f"🔁 Reprocessamento concluído: {updated} ofertas atualizadas.")
+        return updated
+    except Exception as e:
+        logger.error(f"❌ Falha no reprocessamento do histórico: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    reparse_history()
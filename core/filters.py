@@ -0,0 +1,198 @@
+import hashlib
+import logging
+import re
+import time
+import unicodedata
+from dataclasses import dataclass, field, replace
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+from config import settings
+from core.database import SessionLocal, ConfigModel
+
+# Docstring: O motivo desta lógica existir é tirar a leitura de configuração
+# do caminho quente do bot. Os filtros (canais + palavras-chave) são compilados
+# uma única vez em um snapshot imutável e só são reconstruídos quando o painel
+# web incrementa a versão da configuração no SQLite.
+logger = logging.getLogger("FilterEngine")
+
+
+def fold_text(text: str, accent_insensitive: bool = True) -> str:
+    """Normaliza o texto para comparação (minúsculas e, opcionalmente, sem acentos)."""
+    text = text.casefold()
+    if accent_insensitive:
+        text = "".join(
+            c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c)
+        )
+    return text
+
+
+def split_csv(raw: Optional[str]) -> List[str]:
+    """Quebra um campo separado por vírgulas descartando itens vazios."""
+    return [item.strip() for item in (raw or "").split(",") if item.strip()]
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """
+    Gera uma expressão regular fatorada por prefixos a partir de uma trie.
+    Motivo: uma alternância plana (a|b|c...) testa cada palavra em cada posição;
+    com os prefixos fatorados o custo por caractere depende da profundidade
+    da trie e não da quantidade de palavras-chave.
+    """
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        terminal = "" in node
+        singles, multi = [], []
+        for char, child in sorted(node.items()):
+            if char:
+                sub = build(child)
+                (multi if sub else singles).append(re.escape(char) + sub)
+        if not singles and not multi:
+            return ""
+        if len(singles) > 1:
+            singles = ["[" + "".join(singles) + "]"]
+        alternatives = singles + multi
+        atomic = not multi or len(alternatives) > 1
+        body = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+        if terminal:
+            body = (body if atomic else "(?:" + body + ")") + "?"
+        return body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """Casador multi-palavra em passada única sobre o texto normalizado."""
+
+    def __init__(self, keywords: Iterable[str], word_boundary: bool = False, accent_insensitive: bool = True):
+        self.word_boundary = word_boundary
+        self.accent_insensitive = accent_insensitive
+        # Mapeia a forma normalizada de volta para a palavra cadastrada no painel
+        self._originals: Dict[str, str] = {}
+        for kw in keywords:
+            folded = fold_text(kw, accent_insensitive)
+            if folded:
+                self._originals.setdefault(folded, kw)
+
+        self._regex: Optional[re.Pattern] = None
+        if self._originals:
+            body = _trie_pattern(self._originals)
+            if word_boundary:
+                body = rf"(?<!\w)(?:{body})(?!\w)"
+            self._regex = re.compile(body)
+
+        # Ordem de cadastro no painel = prioridade (a primeira palavra pesa mais)
+        self._rank: Dict[str, int] = {kw: i for i, kw in enumerate(self._originals.values())}
+
+    def __len__(self) -> int:
+        return len(self._originals)
+
+    def weight(self, keyword: str) -> float:
+        """Peso de 1.0 (primeira palavra cadastrada) até perto de 0.0 (última)."""
+        if keyword not in self._rank:
+            return 0.0
+        return 1.0 - self._rank[keyword] / len(self._rank)
+
+    def _matches(self, text: str) -> Iterable[re.Match]:
+        if self._regex is None or not text:
+            return ()
+        return self._regex.finditer(fold_text(text, self.accent_insensitive))
+
+    def search(self, text: str) -> Optional[str]:
+        """Retorna a primeira palavra-chave encontrada (ou None)."""
+        for match in self._matches(text):
+            return self._originals.get(match.group(0), match.group(0))
+        return None
+
+    def find_all(self, text: str) -> List[str]:
+        """Retorna todas as palavras-chave distintas encontradas, na ordem do texto."""
+        found: Dict[str, None] = {}
+        for match in self._matches(text):
+            found.setdefault(self._originals.get(match.group(0), match.group(0)))
+        return list(found)
+
+
+def channel_shard(channel: str, count: int) -> int:
+    """Partição dona do canal; blake2b é estável entre processos (ao contrário de hash())."""
+    digest = hashlib.blake2b(channel.lower().encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count
+
+
+@dataclass(frozen=True)
+class FilterSnapshot:
+    """Fotografia imutável dos filtros ativos em uma determinada versão."""
+    version: int
+    channels: FrozenSet[str]
+    matcher: KeywordMatcher = field(repr=False)
+
+    @classmethod
+    def from_config(cls, conf: ConfigModel) -> "FilterSnapshot":
+        return cls(
+            version=conf.version or 0,
+            # Sem configuração salva ainda, caímos nos canais padrão do .env
+            channels=frozenset(c.lower() for c in split_csv(conf.channels) or settings.TARGET_CHANNELS),
+            matcher=KeywordMatcher(
+                split_csv(conf.keywords),
+                word_boundary=settings.KEYWORD_WORD_BOUNDARY,
+                accent_insensitive=settings.KEYWORD_ACCENT_INSENSITIVE,
+            ),
+        )
+
+    def for_shard(self, index: int, count: int) -> "FilterSnapshot":
+        """Mesmo snapshot, restrito aos canais da partição `index` de `count`."""
+        return replace(self, channels=frozenset(c for c in self.channels if channel_shard(c, count) == index))
+
+    def watches(self, chat_username: Optional[str]) -> bool:
+        return bool(chat_username) and chat_username.lower() in self.channels
+
+
+class FilterCache:
+    """
+    Mantém o snapshot em memória e revalida a versão no banco no máximo
+    uma vez a cada `refresh_interval` segundos.
+    Motivo: o painel roda em outro processo (run.py), então a única forma
+    barata de saber que algo mudou é consultar o contador de versão.
+    """
+
+    def __init__(self, refresh_interval: float = None, shard: Optional[Tuple[int, int]] = None):
+        self.refresh_interval = (
+            settings.FILTER_REFRESH_SECONDS if refresh_interval is None else refresh_interval
+        )
+        self.shard = shard  # (índice, total): no modo particionado só os canais da partição contam
+        self._snapshot: Optional[FilterSnapshot] = None
+        self._checked_at = 0.0
+
+    def invalidate(self):
+        """Força a revalidação na próxima chamada de get()."""
+        self._checked_at = 0.0
+
+    def get(self) -> FilterSnapshot:
+        now = time.monotonic()
+        if self._snapshot is not None and now - self._checked_at < self.refresh_interval:
+            return self._snapshot
+
+        db = SessionLocal()
+        try:
+            version = db.query(ConfigModel.version).filter(ConfigModel.id == "global").scalar()
+            if self._snapshot is None or (version or 0) != self._snapshot.version:
+                conf = db.query(ConfigModel).filter(ConfigModel.id == "global").first() or ConfigModel(id="global")
+                snapshot = FilterSnapshot.from_config(conf)
+                self._snapshot = snapshot.for_shard(*self.shard) if self.shard else snapshot
+                logger.info(
+                    f"🔄 Filtros recompilados (versão {self._snapshot.version}): "
+                    f"{len(self._snapshot.channels)} canais, {len(self._snapshot.matcher)} palavras-chave."
+                )
+        except Exception as e:
+            # Em caso de falha mantemos o último snapshot válido
+            logger.error(f"❌ Falha ao recarregar filtros: {e}")
+            if self._snapshot is None:
+                raise
+        finally:
+            db.close()
+
+        self._checked_at = now
+        return self._snapshot
@@ -0,0 +1,282 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from telethon.errors import FloodWaitError
+from config import settings
+from core.database import SessionLocal, ForwardQueueModel
+from core.metrics import ERRORS, FORWARDS
+
+# Docstring: O motivo desta lógica existir é desacoplar a ingestão dos limites
+# de envio do Telegram. O handler apenas registra o match em uma fila
+# persistente (SQLite); uma task dedicada envia respeitando um token bucket,
+# pausa durante FloodWait, reenvia falhas com backoff e, opcionalmente,
+# agrupa vários matches em um único resumo por intervalo.
+logger = logging.getLogger("Forwarder")
+
+PRICE_DROP_WEIGHT = 100.0  # Desconto de 30% soma 30 pontos de prioridade
+KEYWORD_WEIGHT = 50.0  # Primeira palavra-chave do painel soma 50 pontos
+_MESSAGE_CACHE_SIZE = 500
+
+
+def compute_priority(keyword_weight: float, preco: Optional[float], preco_original: Optional[float]) -> float:
+    """Prioridade = peso da palavra-chave + percentual de queda de preço."""
+    priority = KEYWORD_WEIGHT * keyword_weight
+    if preco and preco_original and preco_original > preco:
+        priority += PRICE_DROP_WEIGHT * (1 - preco / preco_original)
+    return round(priority, 2)
+
+
+class TokenBucket:
+    """Limitador clássico: `rate` tokens por segundo com capacidade `burst`."""
+
+    def __init__(self, rate_per_second: float, burst: int):
+        self.rate = rate_per_second
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def release(self):
+        """Devolve um token reservado que acabou não sendo usado (fila vazia)."""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def drain(self):
+        """Zera os tokens (após um FloodWait não faz sentido disparar a rajada inteira)."""
+        self.tokens = 0.0
+        self._updated = time.monotonic()
+
+
+class Forwarder:
+    """Fila de saída persistente com rate limit, retry e modo resumo."""
+
+    def __init__(self, client, target_chat: int = None, worker: int = 0, workers: int = 1):
+        self.client = client
+        # No modo particionado cada worker envia só o que ele mesmo enfileirou (e tem a mídia em memória)
+        self.worker = worker
+        self.workers = workers
+        self.target_chat = target_chat or settings.MY_PRIVATE_GROUP_ID
+        self.bucket = TokenBucket(settings.FORWARD_RATE_PER_MINUTE / 60.0, settings.FORWARD_BURST)
+        self.digest_seconds = settings.FORWARD_DIGEST_SECONDS
+        self.max_attempts = settings.FORWARD_MAX_ATTEMPTS
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._paused_until = 0.0
+        # Mensagens originais do processo atual: permitem reenviar mídia, não só o texto
+        self._messages: "OrderedDict[int, object]" = OrderedDict()
+        self.stats = {"queued": 0, "sent": 0, "failed": 0, "retries": 0, "flood_waits": 0, "digests": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        if self.worker == 0:
+            self._adopt_orphans()
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="forwarder")
+        mode = f"resumo a cada {self.digest_seconds}s" if self.digest_seconds else "envio individual"
+        logger.info(f"📤 Forwarder iniciado ({mode}, {settings.FORWARD_RATE_PER_MINUTE:g}/min).")
+
+    async def stop(self):
+        """Interrompe o envio; itens pendentes ficam no banco para a próxima execução."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        pending = await asyncio.to_thread(self.pending_count)
+        logger.info(f"🛑 Forwarder encerrado. Pendentes na fila: {pending}.")
+
+    async def enqueue(self, *, promo_id: str, fonte: str, keyword: str, priority: float, titulo: str,
+                      preco: Optional[float], link: str, texto: str, message=None) -> int:
+        """Registra um match na fila persistente e acorda o loop de envio."""
+        row = ForwardQueueModel(
+            promo_id=promo_id, fonte=fonte, keyword=keyword, priority=priority, titulo=titulo,
+            preco=preco, link=link, texto=texto,
+            source_message_id=getattr(message, "id", None),
+            next_attempt_at=datetime.utcnow(),
+            worker=self.worker,
+        )
+        item_id = await asyncio.to_thread(self._insert, row)
+        if message is not None:
+            self._messages[item_id] = message
+            if len(self._messages) > _MESSAGE_CACHE_SIZE:
+                self._messages.popitem(last=False)
+        self.stats["queued"] += 1
+        self._wakeup.set()
+        return item_id
+
+    # --- Acesso ao banco (executado em thread) -------------------------------------
+
+    @staticmethod
+    def _insert(row: ForwardQueueModel) -> int:
+        db = SessionLocal()
+        try:
+            db.add(row)
+            db.commit()
+            return row.id
+        finally:
+            db.close()
+
+    def _adopt_orphans(self):
+        """Pendências de workers que não existem mais (N diminuiu) passam para o worker 0."""
+        db = SessionLocal()
+        try:
+            adopted = (
+                db.query(ForwardQueueModel)
+                .filter(ForwardQueueModel.status == "pending", ForwardQueueModel.worker >= self.workers)
+                .update({"worker": 0}, synchronize_session=False)
+            )
+            db.commit()
+            if adopted:
+                logger.info(f"📦 {adopted} encaminhamentos pendentes de workers antigos assumidos pelo worker 0.")
+        finally:
+            db.close()
+
+    def _fetch_due(self, limit: int) -> List[Dict]:
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(ForwardQueueModel)
+                .filter(
+                    ForwardQueueModel.status == "pending",
+                    ForwardQueueModel.worker == self.worker,
+                    ForwardQueueModel.next_attempt_at <= datetime.utcnow(),
+                )
+                .order_by(ForwardQueueModel.priority.desc(), ForwardQueueModel.id.asc())
+                .limit(limit)
+                .all()
+            )
+            return [
+                {"id": r.id, "titulo": r.titulo, "preco": r.preco, "link": r.link, "texto": r.texto,
+                 "keyword": r.keyword, "attempts": r.attempts or 0}
+                for r in rows
+            ]
+        finally:
+            db.close()
+
+    @staticmethod
+    def _mark(ids: List[int], **values):
+        db = SessionLocal()
+        try:
+            db.query(ForwardQueueModel).filter(ForwardQueueModel.id.in_(ids)).update(values, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def pending_count(self) -> int:
+        db = SessionLocal()
+        try:
+            return (
+                db.query(ForwardQueueModel)
+                .filter(ForwardQueueModel.status == "pending", ForwardQueueModel.worker == self.worker)
+                .count()
+            )
+        finally:
+            db.close()
+
+    # --- Loop de envio -------------------------------------------------------------
+
+    async def _run(self):
+        while True:
+            try:
+                pause = self._paused_until - time.monotonic()
+                if pause > 0:
+                    await asyncio.sleep(pause)
+
+                if self.digest_seconds:
+                    await asyncio.sleep(self.digest_seconds)
+
+                # Espera o token antes de ler a fila: itens de prioridade maior que
+                # chegarem durante a espera passam na frente dos que já estavam lá
+                await self.bucket.acquire()
+                limit = settings.FORWARD_DIGEST_MAX_ITEMS if self.digest_seconds else 1
+                items = await asyncio.to_thread(self._fetch_due, limit)
+
+                if not items:
+                    self.bucket.release()
+                    if not self.digest_seconds:
+                        self._wakeup.clear()
+                        try:
+                            # Timeout cobre itens agendados para retry no futuro
+                            await asyncio.wait_for(self._wakeup.wait(), timeout=5)
+                        except asyncio.TimeoutError:
+                            pass
+                    continue
+
+                await self._send(items)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                ERRORS.inc(component="forwarder")
+                logger.error(f"❌ Erro no loop do Forwarder: {e}", exc_info=True)
+                await asyncio.sleep(1)
+
+    def _format_digest(self, items: List[Dict]) -> str:
+        lines = [f"🔥 {len(items)} ofertas em destaque\n"]
+        for item in items:
+            preco = f" — R$ {item['preco']:.2f}" if item["preco"] else ""
+            lines.append(f"• {item['titulo']}{preco}\n{item['link']}")
+        return "\n\n".join(lines)
+
+    async def _send(self, items: List[Dict]):
+        ids = [item["id"] for item in items]
+        try:
+            if len(items) > 1 or self.digest_seconds:
+                await self.client.send_message(self.target_chat, self._format_digest(items), link_preview=False)
+                self.stats["digests"] += 1
+            else:
+                item = items[0]
+                payload = self._messages.get(item["id"]) or item["texto"]
+                await self.client.send_message(self.target_chat, payload)
+        except FloodWaitError as e:
+            # Não conta como tentativa: o item volta para a fila e todo o envio pausa
+            self.stats["flood_waits"] += 1
+            FORWARDS.inc(result="flood_wait")
+            self._paused_until = time.monotonic() + e.seconds
+            self.bucket.drain()
+            logger.warning(f"⏳ FloodWait do Telegram: pausando encaminhamentos por {e.seconds}s.")
+            return
+        except Exception as e:
+            attempts = max(item["attempts"] for item in items) + 1
+            if attempts >= self.max_attempts:
+                self.stats["failed"] += len(items)
+                FORWARDS.inc(len(items), result="failed")
+                await asyncio.to_thread(self._mark, ids, status="failed", attempts=attempts, last_error=str(e)[:500])
+                logger.error(f"❌ Encaminhamento descartado após {attempts} tentativas: {e}")
+            else:
+                self.stats["retries"] += len(items)
+                FORWARDS.inc(len(items), result="retry")
+                backoff = datetime.utcnow() + timedelta(seconds=min(300, 2 ** attempts * 5))
+                await asyncio.to_thread(
+                    self._mark, ids, attempts=attempts, next_attempt_at=backoff, last_error=str(e)[:500]
+                )
+                logger.warning(f"⚠️ Falha ao encaminhar (tentativa {attempts}): {e}. Nova tentativa agendada.")
+            return
+
+        await asyncio.to_thread(self._mark, ids, status="sent", sent_at=datetime.utcnow())
+        for item_id in ids:
+            self._messages.pop(item_id, None)
+        self.stats["sent"] += len(items)
+        FORWARDS.inc(len(items), result="sent")
+        logger.info(f"🚀 Encaminhada(s) para o Grupo Privado: {len(items)} oferta(s).")
@@ -0,0 +1,167 @@
+import glob
+import gzip
+import logging
+import os
+import re
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Iterator, List, Optional
+
+# Docstring: O motivo desta lógica existir é ler o final do log sem carregar o
+# arquivo inteiro em memória. O arquivo ativo é lido de trás para frente em
+# blocos (custo proporcional às linhas pedidas) e, se faltar histórico, a busca
+# continua nos arquivos rotacionados compactados (engine.log.1.gz, .2.gz...).
+logger = logging.getLogger("LogTail")
+
+BLOCK_SIZE = 8192
+# Formato definido em config.py: '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+HEADER_RE = re.compile(r'^\d{4}-\d{2}-\d{2} [\d:,]+ - (?P<name>.+?) - (?P<level>[A-Z]+) - ')
+
+
+@dataclass(frozen=True)
+class LogFilter:
+    """Filtros aplicados por registro (linhas de traceback acompanham o cabeçalho)."""
+    min_level: Optional[str] = None
+    logger_name: Optional[str] = None
+    contains: Optional[str] = None
+
+    @property
+    def _min_levelno(self) -> int:
+        level = logging.getLevelName((self.min_level or "").upper())
+        return level if isinstance(level, int) else logging.NOTSET
+
+    def accepts(self, record: str) -> bool:
+        header = HEADER_RE.match(record)
+        if self.min_level or self.logger_name:
+            if header is None:
+                return False
+            if self.logger_name and header.group("name") != self.logger_name:
+                return False
+            level = logging.getLevelName(header.group("level"))
+            if self.min_level and isinstance(level, int) and level < self._min_levelno:
+                return False
+        if self.contains and self.contains.lower() not in record.lower():
+            return False
+        return True
+
+
+def _reverse_lines(path: str) -> Iterator[str]:
+    """Gera as linhas de um arquivo do fim para o começo, lendo blocos com seek."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        remainder = b""
+        while position > 0:
+            step = min(BLOCK_SIZE, position)
+            position -= step
+            f.seek(position)
+            chunk = f.read(step) + remainder
+            lines = chunk.split(b"\n")
+            remainder = lines.pop(0)  # Pode ser uma linha incompleta; completa no próximo bloco
+            for line in reversed(lines):
+                if line:
+                    yield line.decode("utf-8", errors="replace")
+        if remainder:
+            yield remainder.decode("utf-8", errors="replace")
+
+
+def _reverse_records(lines: Iterator[str]) -> Iterator[str]:
+    """Agrupa linhas de continuação (tracebacks) ao registro que as originou."""
+    pending: List[str] = []
+    for line in lines:
+        pending.append(line)
+        if HEADER_RE.match(line):
+            yield "\n".join(reversed(pending))
+            pending = []
+    if pending:
+        yield "\n".join(reversed(pending))
+
+
+def _archive_records(path: str) -> Iterator[str]:
+    """Lê um arquivo rotacionado (compactado ou não) e devolve os registros do fim para o começo."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+        lines = [line.rstrip("\n") for line in f]
+    return _reverse_records(reversed(lines))
+
+
+def archive_paths(path: str) -> List[str]:
+    """Arquivos rotacionados do mais novo (.1) para o mais antigo."""
+    def index(p: str) -> int:
+        suffix = p[len(path) + 1:].split(".")[0]
+        return int(suffix) if suffix.isdigit() else 0
+    return sorted(glob.glob(glob.escape(path) + ".*"), key=index)
+
+
+def tail(path: str, lines: int = 100, filters: LogFilter = LogFilter(), include_archives: bool = True) -> List[str]:
+    """Retorna os últimos `lines` registros que passam nos filtros, em ordem cronológica."""
+    found: Deque[str] = deque()
+    sources: List[Iterator[str]] = []
+    if os.path.exists(path):
+        sources.append(_reverse_records(_reverse_lines(path)))
+    if include_archives:
+        # Geradores preguiçosos: arquivos antigos só são abertos se o ativo não bastar
+        sources.extend(_archive_records(p) for p in archive_paths(path) if not p.endswith(".lock"))
+
+    for records in sources:
+        for record in records:
+            if filters.accepts(record):
+                found.appendleft(record)
+                if len(found) >= lines:
+                    return list(found)
+    return list(found)
+
+
+class LogFollower:
+    """
+    Acompanha o arquivo de log a partir do fim (equivalente a `tail -F`).
+    Detecta rotação pelo inode/tamanho e reabre o arquivo novo.
+    """
+
+    def __init__(self, path: str, filters: LogFilter = LogFilter()):
+        self.path = path
+        self.filters = filters
+        self._file = None
+        self._inode = None
+        self._buffer = ""
+
+    def _open(self, at_end: bool):
+        self.close()
+        if not os.path.exists(self.path):
+            return
+        self._file = open(self.path, "r", encoding="utf-8", errors="replace")
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        if at_end:
+            self._file.seek(0, os.SEEK_END)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def poll(self) -> List[str]:
+        """Retorna os registros novos desde a última chamada."""
+        if self._file is None:
+            self._open(at_end=self._inode is None)
+            if self._file is None:
+                return []
+        else:
+            try:
+                stat = os.stat(self.path)
+                if stat.st_ino != self._inode or stat.st_size < self._file.tell():
+                    self._open(at_end=False)  # Rotacionou: lê o arquivo novo desde o início
+            except FileNotFoundError:
+                return []
+
+        self._buffer += self._file.read()
+        if "\n" not in self._buffer:
+            return []
+        complete, self._buffer = self._buffer.rsplit("\n", 1)
+
+        records: List[str] = []
+        for line in complete.split("\n"):
+            if HEADER_RE.match(line) or not records:
+                records.append(line)
+            else:
+                records[-1] += "\n" + line
+        return [r for r in records if r and self.filters.accepts(r)]
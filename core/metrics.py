@@ -0,0 +1,303 @@
+import asyncio
+import bisect
+import glob
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from config import settings
+
+# Docstring: O motivo desta lógica existir é medir onde o tempo é gasto no
+# pipeline sem pesar no caminho quente. Cada processo (bot e dashboard) mantém
+# contadores e histogramas em memória (um incremento de dict por evento) e
+# grava periodicamente um snapshot JSON atômico em METRICS_DIR; o dashboard
+# junta os snapshots e expõe tudo no formato texto do Prometheus em /metrics.
+logger = logging.getLogger("Metrics")
+
+# Buckets em segundos: de 0,1ms a 5s, cobrindo de um regex até um commit lento
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 200, 500, 1000)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted(labels.items()))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self.values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _key(labels)
+        self.values[key] = self.values.get(key, 0.0) + amount
+
+    def snapshot(self) -> List:
+        return [[list(map(list, k)), v] for k, v in self.values.items()]
+
+
+class Gauge(_Metric):
+    """Gauge lido sob demanda (callback), sem custo nenhum no caminho quente."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self.callbacks: Dict[LabelKey, Callable[[], float]] = {}
+
+    def set_function(self, fn: Callable[[], float], **labels):
+        self.callbacks[_key(labels)] = fn
+
+    def snapshot(self) -> List:
+        result = []
+        for key, fn in self.callbacks.items():
+            try:
+                result.append([list(map(list, key)), float(fn())])
+            except Exception as e:
+                logger.debug(f"Gauge {self.name} indisponível: {e}")
+        return result
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(buckets)
+        # Por label: [contagem por bucket (não cumulativa) + overflow, soma, total]
+        self.values: Dict[LabelKey, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = _key(labels)
+        data = self.values.get(key)
+        if data is None:
+            data = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        data[0][bisect.bisect_left(self.buckets, value)] += 1
+        data[1] += value
+        data[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def snapshot(self) -> List:
+        return [[list(map(list, k)), {"buckets": v[0], "sum": v[1], "count": v[2]}] for k, v in self.values.items()]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._register(Counter(name, help_text))
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self._register(Gauge(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, buckets))
+
+    def snapshot(self, process: str) -> Dict:
+        return {
+            "process": process,
+            "pid": os.getpid(),
+            "updated_at": time.time(),
+            "metrics": {
+                m.name: {
+                    "kind": m.kind, "help": m.help, "samples": m.snapshot(),
+                    **({"buckets": list(m.buckets)} if isinstance(m, Histogram) else {}),
+                }
+                for m in self.metrics.values()
+            },
+        }
+
+
+REGISTRY = MetricsRegistry()
+
+# --- Métricas do pipeline ---------------------------------------------------------
+
+MESSAGES = REGISTRY.counter("promo_messages_total", "Mensagens processadas por resultado")
+STAGE_SECONDS = REGISTRY.histogram("promo_stage_seconds", "Latência por estágio do message_handler")
+ERRORS = REGISTRY.counter("promo_errors_total", "Erros por componente")
+DB_COMMIT_SECONDS = REGISTRY.histogram("promo_db_commit_seconds", "Tempo de gravação de um lote no SQLite")
+BATCH_SIZE = REGISTRY.histogram("promo_db_batch_size", "Linhas por lote gravado", SIZE_BUCKETS)
+FORWARDS = REGISTRY.counter("promo_forwards_total", "Encaminhamentos por resultado")
+QUEUE_DEPTH = REGISTRY.gauge("promo_queue_depth", "Itens aguardando em cada fila")
+CACHE_ENTRIES = REGISTRY.gauge("promo_cache_entries", "Entradas em caches de memória")
+HTTP_SECONDS = REGISTRY.histogram("promo_http_seconds", "Latência das rotas do dashboard")
+PAGE_CACHE = REGISTRY.counter("promo_page_cache_total", "Acessos ao cache da página inicial")
+RETENTION_ROWS = REGISTRY.counter("promo_retention_rows_total", "Linhas arquivadas/removidas pela retenção")
+
+
+# --- Compartilhamento entre processos -------------------------------------------
+
+def _snapshot_path(process: str) -> str:
+    return os.path.join(settings.METRICS_DIR, f"{process}.json")
+
+
+# Snapshots sem atualização por mais que esse número de intervalos são de
+# processos encerrados (backfill, replay, workers removidos) e são descartados
+_STALE_INTERVALS = 3
+
+
+def export_snapshot(process: str):
+    """Grava o snapshot do processo de forma atômica (tmp + rename)."""
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    path = _snapshot_path(process)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(REGISTRY.snapshot(process), f)
+    os.replace(tmp, path)
+
+
+def remove_snapshot(process: str):
+    """Apaga o snapshot do processo (encerramento limpo)."""
+    try:
+        os.remove(_snapshot_path(process))
+    except FileNotFoundError:
+        pass
+
+
+async def run_exporter(process: str, interval: float = None):
+    """Task de fundo que exporta o snapshot periodicamente; ao ser cancelada, apaga o snapshot."""
+    interval = interval or settings.METRICS_EXPORT_SECONDS
+    try:
+        while True:
+            try:
+                await asyncio.to_thread(export_snapshot, process)
+            except Exception as e:
+                logger.warning(f"⚠️ Falha ao exportar métricas: {e}")
+            await asyncio.sleep(interval)
+    finally:
+        remove_snapshot(process)
+
+
+def collect_snapshots(local_process: Optional[str] = None) -> List[Dict]:
+    """Snapshots de todos os processos; o do processo local é lido da memória (sempre atual)."""
+    snapshots = []
+    if local_process:
+        snapshots.append(REGISTRY.snapshot(local_process))
+    stale_before = time.time() - settings.METRICS_EXPORT_SECONDS * _STALE_INTERVALS
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, "*.json")):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                snap = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if snap.get("updated_at", 0) < stale_before:
+            # Processo que morreu sem apagar o próprio snapshot
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        if snap.get("process") != local_process:
+            snapshots.append(snap)
+    return snapshots
+
+
+# --- Exposição ------------------------------------------------------------------
+
+def _fmt_labels(labels: List, extra: Dict[str, str] = None) -> str:
+    pairs = [(k, v) for k, v in labels] + list((extra or {}).items())
+    if not pairs:
+        return ""
+    escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+_UPDATED_METRIC = "promo_metrics_updated_timestamp"
+
+
+def render_prometheus(snapshots: List[Dict]) -> str:
+    """
+    Formato de exposição texto do Prometheus (v0.0.4), com label `process`.
+    O formato exige um único bloco por família: as amostras de todos os
+    processos são agrupadas por métrica antes de escritas.
+    """
+    families: Dict[str, Dict] = {}
+    for snap in snapshots:
+        process = {"process": snap["process"]}
+        for name, metric in snap["metrics"].items():
+            family = families.setdefault(name, {"help": metric["help"], "kind": metric["kind"], "lines": []})
+            lines = family["lines"]
+            for labels, value in metric["samples"]:
+                if metric["kind"] != "histogram":
+                    lines.append(f"{name}{_fmt_labels(labels, process)} {value}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric["buckets"] + ["+Inf"], value["buckets"]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_fmt_labels(labels, {**process, 'le': bound})} {cumulative}")
+                lines.append(f"{name}_sum{_fmt_labels(labels, process)} {value['sum']}")
+                lines.append(f"{name}_count{_fmt_labels(labels, process)} {value['count']}")
+        updated = families.setdefault(_UPDATED_METRIC, {
+            "help": "Momento (epoch) do último snapshot de cada processo", "kind": "gauge", "lines": [],
+        })
+        updated["lines"].append(f"{_UPDATED_METRIC}{_fmt_labels([], process)} {snap['updated_at']}")
+
+    output: List[str] = []
+    for name, family in families.items():
+        output.append(f"# HELP {name} {family['help']}")
+        output.append(f"# TYPE {name} {family['kind']}")
+        output.extend(family["lines"])
+    return "\n".join(output) + "\n"
+
+
+def histogram_quantile(q: float, buckets: List[float], counts: List[int]) -> Optional[float]:
+    """Estimativa de quantil por interpolação linear dentro do bucket (como no PromQL)."""
+    total = sum(counts)
+    if not total:
+        return None
+    target = q * total
+    cumulative = 0
+    lower = 0.0
+    for bound, count in zip(buckets, counts):
+        if cumulative + count >= target and count:
+            return lower + (bound - lower) * (target - cumulative) / count
+        cumulative += count
+        lower = bound
+    return buckets[-1]
+
+
+def summarize(snapshots: List[Dict]) -> Dict:
+    """Visão resumida para a página do dashboard: contadores e p50/p99 por série."""
+    counters, gauges, latencies = [], [], []
+    for snap in snapshots:
+        for name, metric in snap["metrics"].items():
+            for labels, value in metric["samples"]:
+                label_text = ", ".join(f"{k}={v}" for k, v in labels) or "-"
+                row = {"process": snap["process"], "name": name, "labels": label_text}
+                if metric["kind"] == "counter":
+                    counters.append({**row, "value": value})
+                elif metric["kind"] == "gauge":
+                    gauges.append({**row, "value": value})
+                else:
+                    p50 = histogram_quantile(0.5, metric["buckets"], value["buckets"])
+                    p99 = histogram_quantile(0.99, metric["buckets"], value["buckets"])
+                    latencies.append({
+                        **row, "count": value["count"],
+                        "avg": value["sum"] / value["count"] if value["count"] else None,
+                        "p50": p50, "p99": p99, "is_size": name == BATCH_SIZE.name,
+                    })
+    return {"counters": counters, "gauges": gauges, "latencies": latencies}
@@ -0,0 +1,220 @@
+import asyncio
+import glob
+import gzip
+import json
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+from sqlalchemy import bindparam, text
+from config import settings
+from core.database import FTS_TABLE, PromoModel, engine, mark_promotions_changed, rebuild_search_index
+from core.metrics import RETENTION_ROWS
+
+# Docstring: O motivo desta lógica existir é manter o banco vivo pequeno sem
+# pausas. Em vez de um DELETE único no boot (um lock longo que trava o bot),
+# uma task periódica move as ofertas expiradas em lotes pequenos pelo índice
+# (data_captura, id): cada lote é gravado em um arquivo gzip JSONL por dia em
+# ARCHIVE_DIR e só então apagado, com uma pausa entre lotes para o writer.
+# Ao final, o espaço livre é devolvido aos poucos (incremental_vacuum) e as
+# estatísticas do planner são atualizadas (PRAGMA optimize).
+logger = logging.getLogger("Retention")
+
+_ARCHIVE_COLUMNS = [column.name for column in PromoModel.__table__.columns]
+# Percorre o índice ix_promotions_captura_id do mais antigo para o mais novo
+_EXPIRED_PAGE = text(
+    f"SELECT rowid, {', '.join(_ARCHIVE_COLUMNS)} FROM promotions "
+    "WHERE data_captura < :cutoff ORDER BY data_captura, id LIMIT :limit"
+)
+_DELETE_ROWIDS = text("DELETE FROM promotions WHERE rowid IN :rowids").bindparams(
+    bindparam("rowids", expanding=True)
+)
+# Encaminhamentos concluídos não têm valor histórico: saem sem arquivamento
+_DELETE_FORWARDS = text(
+    "DELETE FROM forward_queue WHERE id IN ("
+    "SELECT id FROM forward_queue WHERE status != 'pending' AND created_at < :cutoff LIMIT :limit)"
+)
+_FTS_MERGE_PAGES = 200
+
+
+def archive_path(day: str, archive_dir: str = None) -> str:
+    """archive/promotions/2024/11/2024-11-29.jsonl.gz"""
+    return os.path.join(archive_dir or settings.ARCHIVE_DIR, "promotions", day[:4], day[5:7], f"{day}.jsonl.gz")
+
+
+def write_archive(rows: List[Dict], archive_dir: str = None) -> int:
+    """
+    Acrescenta as linhas ao arquivo do dia de captura de cada uma.
+    Cada chamada grava um membro gzip completo; o gzip (e o zcat) leem membros
+    concatenados como um único fluxo.
+    """
+    by_day: Dict[str, List[Dict]] = defaultdict(list)
+    for row in rows:
+        by_day[str(row["data_captura"])[:10]].append(row)
+    for day, day_rows in by_day.items():
+        path = archive_path(day, archive_dir)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = "".join(json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in day_rows)
+        with gzip.open(path, "at", encoding="utf-8") as f:
+            f.write(payload)
+    return len(rows)
+
+
+def iter_archive(start: Optional[str] = None, end: Optional[str] = None, archive_dir: str = None) -> Iterator[Dict]:
+    """
+    Lê o arquivo frio offline, opcionalmente limitado a um intervalo de dias
+    ('2024-11-01' a '2024-11-30', inclusivo). Após uma queda entre o arquivamento
+    e o DELETE, uma oferta pode aparecer duas vezes: use o `id` para deduplicar.
+    """
+    pattern = os.path.join(archive_dir or settings.ARCHIVE_DIR, "promotions", "*", "*", "*.jsonl.gz")
+    for path in sorted(glob.glob(pattern)):
+        day = os.path.basename(path)[:10]
+        if (start and day < start) or (end and day > end):
+            continue
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def auto_vacuum_mode() -> int:
+    """0 = desligado, 1 = completo, 2 = incremental."""
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("PRAGMA auto_vacuum").scalar()
+
+
+def vacuum_full():
+    """
+    VACUUM completo (manutenção manual, com o bot parado). Converte bancos
+    antigos para auto_vacuum incremental e reconstrói o índice de busca, já que
+    o VACUUM pode renumerar os rowids da tabela `promotions`.
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("VACUUM")
+    rebuild_search_index()
+    logger.info(f"🧽 VACUUM completo concluído (auto_vacuum={auto_vacuum_mode()}).")
+
+
+class RetentionScheduler:
+    """Task periódica de retenção: arquiva e apaga em lotes, depois compacta aos poucos."""
+
+    def __init__(self, days: int = None, interval: float = None, batch_size: int = None, archive: bool = None):
+        self.days = settings.RETENTION_DAYS if days is None else days
+        self.interval = interval or settings.RETENTION_INTERVAL_SECONDS
+        self.batch_size = batch_size or settings.RETENTION_BATCH_SIZE
+        self.pause = settings.RETENTION_BATCH_PAUSE_SECONDS
+        self.archive = bool(settings.ARCHIVE_DIR) if archive is None else archive
+        self._task: Optional[asyncio.Task] = None
+        self._vacuum_hint_logged = False
+        self.stats = {"runs": 0, "archived": 0, "deleted": 0, "forwards_deleted": 0, "vacuum_pages": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.running:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="retention")
+        destino = f"arquivando em {settings.ARCHIVE_DIR}" if self.archive else "sem arquivamento"
+        logger.info(f"🗓️ Retenção iniciada ({self.days} dias, a cada {self.interval:g}s, {destino}).")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Falha na rotina de retenção: {e}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> Dict[str, int]:
+        """Executa um ciclo completo; cada lote é uma transação curta em uma thread."""
+        cutoff = datetime.utcnow() - timedelta(days=self.days)
+        moved = forwards = 0
+        while True:
+            count = await asyncio.to_thread(self._expire_batch, cutoff)
+            if not count:
+                break
+            moved += count
+            await asyncio.sleep(self.pause)
+        while True:
+            count = await asyncio.to_thread(self._delete_forwards_batch, cutoff)
+            if not count:
+                break
+            forwards += count
+            await asyncio.sleep(self.pause)
+        pages = await asyncio.to_thread(self._maintain, moved + forwards > 0)
+
+        self.stats["runs"] += 1
+        self.stats["deleted"] += moved
+        self.stats["forwards_deleted"] += forwards
+        self.stats["vacuum_pages"] += pages
+        if moved or forwards:
+            logger.info(
+                f"🧹 Retenção: {moved} ofertas {'arquivadas e ' if self.archive else ''}removidas, "
+                f"{forwards} encaminhamentos antigos apagados, {pages} páginas devolvidas ao disco."
+            )
+        return {"promotions": moved, "forward_queue": forwards, "vacuum_pages": pages}
+
+    def _expire_batch(self, cutoff: datetime) -> int:
+        with engine.connect() as conn:
+            rows = conn.execute(_EXPIRED_PAGE, {"cutoff": cutoff, "limit": self.batch_size}).mappings().all()
+            if not rows:
+                return 0
+            if self.archive:
+                # O arquivo é gravado antes do DELETE: uma queda aqui duplica, mas nunca perde
+                write_archive([{k: row[k] for k in _ARCHIVE_COLUMNS} for row in rows])
+                self.stats["archived"] += len(rows)
+                RETENTION_ROWS.inc(len(rows), table="promotions", action="archived")
+            conn.execute(_DELETE_ROWIDS, {"rowids": [row["rowid"] for row in rows]})
+            mark_promotions_changed(conn)
+            conn.commit()
+        RETENTION_ROWS.inc(len(rows), table="promotions", action="deleted")
+        return len(rows)
+
+    def _delete_forwards_batch(self, cutoff: datetime) -> int:
+        with engine.connect() as conn:
+            deleted = conn.execute(_DELETE_FORWARDS, {"cutoff": cutoff, "limit": self.batch_size}).rowcount
+            conn.commit()
+        if deleted:
+            RETENTION_ROWS.inc(deleted, table="forward_queue", action="deleted")
+        return deleted
+
+    def _maintain(self, deleted_rows: bool) -> int:
+        """Compactação incremental; devolve o número de páginas liberadas."""
+        if deleted_rows:
+            # Mescla alguns segmentos do FTS5 (os deletes deixam marcas até o merge)
+            with engine.begin() as conn:
+                conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('merge', {_FTS_MERGE_PAGES})"))
+
+        raw = engine.raw_connection()
+        try:
+            cursor = raw.cursor()
+            pages = 0
+            if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                before = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+                # executescript roda o pragma até o fim; execute() daria um único passo (uma página)
+                raw.driver_connection.executescript(f"PRAGMA incremental_vacuum({settings.RETENTION_VACUUM_PAGES});")
+                pages = before - cursor.execute("PRAGMA freelist_count").fetchone()[0]
+            elif not self._vacuum_hint_logged:
+                self._vacuum_hint_logged = True
+                logger.info("ℹ️ Banco sem auto_vacuum incremental. Rode `python run.py retention --vacuum` uma vez.")
+            cursor.execute("PRAGMA optimize")
+            cursor.close()
+            raw.commit()
+        finally:
+            raw.close()
+        return pages
@@ -11,6 +11,9 @@ class PromoItem(BaseModel):
     id: str = Field(..., description="Hash MD5 do link ou ID único da mensagem")
     titulo: str
     preco: Optional[float] = None
+    preco_original: Optional[float] = None  # Preço "de" quando a mensagem traz "de R$ X por R$ Y"
+    parcelas: Optional[int] = None
+    valor_parcela: Optional[float] = None
     link: str
     loja: Optional[str] = "Não identificada"
     fonte: str  # Ex: 'Telegram - Gafanhoto'
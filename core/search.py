@@ -0,0 +1,142 @@
+import base64
+import json
+import logging
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import Float, Integer, Select, literal_column, select, text, tuple_
+from core.database import FTS_TABLE, PromoModel
+
+# Docstring: O motivo desta lógica existir é manter a busca do dashboard com
+# latência estável conforme a tabela cresce. A filtragem textual usa o índice
+# FTS5 (em vez de LIKE '%q%') e a paginação usa cursor sobre (data_captura, id),
+# que percorre o índice composto sem OFFSET.
+logger = logging.getLogger("SearchEngine")
+
+PAGE_SIZE = 50
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+ORDER_RECENT = "recentes"
+ORDER_RELEVANCE = "relevancia"
+
+
+def build_match_query(q: str) -> Optional[str]:
+    """
+    Converte a busca livre do usuário em uma expressão MATCH do FTS5.
+    Cada termo vira um prefixo entre aspas ("ipho"*), combinados com AND;
+    isso também neutraliza operadores/aspas digitados pelo usuário.
+    """
+    tokens = TOKEN_RE.findall(q or "")
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def encode_cursor(values: Tuple) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[list]:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        logger.warning(f"⚠️ Cursor de paginação inválido ignorado: {cursor[:20]}")
+        return None
+
+
+def cursor_position(values: Optional[list], by_relevance: bool) -> Optional[tuple]:
+    """
+    Valida o cursor decodificado para a ordenação ativa: (rank, id) na relevância,
+    (data_captura, id) nas recentes. Qualquer outro formato é ignorado.
+    """
+    if not isinstance(values, list) or len(values) != 2 or not isinstance(values[1], str):
+        position = None
+    elif by_relevance:
+        rank = values[0]
+        position = (float(rank), values[1]) if isinstance(rank, (int, float)) and not isinstance(rank, bool) else None
+    else:
+        try:
+            position = (datetime.fromisoformat(values[0]), values[1])
+        except (TypeError, ValueError):
+            position = None
+    if values is not None and position is None:
+        logger.warning(f"⚠️ Cursor de paginação incompatível com a ordenação ignorado: {str(values)[:40]}")
+    return position
+
+
+@dataclass
+class SearchFilters:
+    """Parâmetros de busca vindos da querystring do dashboard."""
+    q: Optional[str] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    fonte: Optional[str] = None
+    order: str = ORDER_RECENT
+    cursor: Optional[str] = None
+    limit: int = PAGE_SIZE
+
+    @property
+    def match(self) -> Optional[str]:
+        return build_match_query(self.q)
+
+    @property
+    def by_relevance(self) -> bool:
+        return self.order == ORDER_RELEVANCE and self.match is not None
+
+
+def build_search_stmt(filters: SearchFilters) -> Select:
+    """
+    Monta o SELECT da página pedida. Retorna linhas (PromoModel, rank);
+    pede `limit + 1` registros para saber se existe próxima página.
+    """
+    match = filters.match
+    if match:
+        fts = (
+            text(f"SELECT rowid AS rid, rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match")
+            .bindparams(match=match)
+            .columns(rid=Integer, rank=Float)
+            .subquery("fts")
+        )
+        rank = fts.c.rank
+        stmt = select(PromoModel, rank).join(fts, fts.c.rid == literal_column("promotions.rowid"))
+    else:
+        rank = literal_column("0.0")
+        stmt = select(PromoModel, rank)
+
+    if filters.min_price is not None:
+        stmt = stmt.where(PromoModel.preco >= filters.min_price)
+    if filters.max_price is not None:
+        stmt = stmt.where(PromoModel.preco <= filters.max_price)
+    if filters.fonte:
+        stmt = stmt.where(PromoModel.fonte == "@" + filters.fonte.lstrip("@"))
+
+    after = cursor_position(decode_cursor(filters.cursor), filters.by_relevance)
+    if filters.by_relevance:
+        # bm25 é negativo: quanto menor, mais relevante
+        if after:
+            stmt = stmt.where(tuple_(rank, PromoModel.id) > tuple_(*after))
+        stmt = stmt.order_by(rank.asc(), PromoModel.id.asc())
+    else:
+        if after:
+            stmt = stmt.where(tuple_(PromoModel.data_captura, PromoModel.id) < tuple_(*after))
+        stmt = stmt.order_by(PromoModel.data_captura.desc(), PromoModel.id.desc())
+
+    return stmt.limit(filters.limit + 1)
+
+
+def paginate(rows: List[tuple], filters: SearchFilters) -> Tuple[List[PromoModel], Optional[str]]:
+    """Separa a página atual e calcula o cursor da próxima (ou None na última)."""
+    has_next = len(rows) > filters.limit
+    rows = rows[: filters.limit]
+    promos = [row[0] for row in rows]
+    if not has_next or not rows:
+        return promos, None
+    last, last_rank = rows[-1][0], rows[-1][1]
+    if filters.by_relevance:
+        return promos, encode_cursor((last_rank, last.id))
+    return promos, encode_cursor((last.data_captura, last.id))
@@ -0,0 +1,237 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+from config import settings
+from core.database import ChannelCheckpointModel, SessionLocal, PromoModel, mark_promotions_changed
+from core.metrics import BATCH_SIZE, DB_COMMIT_SECONDS, ERRORS
+
+# Docstring: O motivo desta lógica existir é tirar o commit do SQLite de dentro
+# do loop do Telethon. O handler apenas enfileira a oferta; uma task dedicada
+# agrupa as linhas e as grava em lote (INSERT ... ON CONFLICT DO NOTHING) em uma
+# thread própria, de forma que um fsync lento não congele os demais canais.
+logger = logging.getLogger("PromoWriter")
+
+_Pending = Tuple[Dict, asyncio.Future]
+_FLUSH = object()  # Marcador: grava o lote em formação sem esperar o intervalo
+
+# Compilado uma vez; executado como executemany ("insertmanyvalues" do SQLAlchemy 2.0),
+# que é ~10x mais barato do que montar um VALUES gigante a cada lote
+_INSERT_STMT = (
+    insert(PromoModel)
+    .on_conflict_do_nothing(index_elements=[PromoModel.id])
+    .returning(PromoModel.id)
+)
+# O checkpoint de um canal só avança (o backfill pode ter gravado um id maior)
+_checkpoint_insert = insert(ChannelCheckpointModel)
+_CHECKPOINT_STMT = _checkpoint_insert.on_conflict_do_update(
+    index_elements=[ChannelCheckpointModel.channel],
+    set_={
+        "last_message_id": func.max(ChannelCheckpointModel.last_message_id, _checkpoint_insert.excluded.last_message_id),
+        "updated_at": _checkpoint_insert.excluded.updated_at,
+    },
+)
+
+
+class PromoWriter:
+    """Fila assíncrona com escrita em lote e backpressure para PromoModel."""
+
+    def __init__(
+        self,
+        batch_size: int = None,
+        flush_interval: float = None,
+        max_queue: int = None,
+    ):
+        self.batch_size = batch_size or settings.WRITE_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.WRITE_FLUSH_SECONDS
+        self.max_queue = max_queue or settings.WRITE_QUEUE_MAXSIZE
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._saturated = False
+        # Último id de mensagem visto por canal no tempo real; gravado junto com o próximo lote
+        self._checkpoints: Dict[str, int] = {}
+        self.stats = {
+            "enqueued": 0,
+            "inserted": 0,
+            "duplicates": 0,
+            "batches": 0,
+            "errors": 0,
+            "last_batch_size": 0,
+            "last_flush_ms": 0.0,
+            "max_depth": 0,
+        }
+
+    @property
+    def depth(self) -> int:
+        """Quantidade de ofertas aguardando gravação."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Cria a fila e a task de escrita no loop corrente."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        # Uma única thread garante que os lotes sejam gravados em ordem, sem disputa de lock
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="PromoWriter")
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="promo-writer")
+        logger.info(
+            f"🧵 Writer iniciado (lote={self.batch_size}, intervalo={self.flush_interval}s, fila={self.max_queue})."
+        )
+
+    async def submit(self, row: Dict) -> asyncio.Future:
+        """
+        Enfileira uma linha de PromoModel e devolve um Future que resolve para
+        True (inserida) ou False (duplicada). Bloqueia quando a fila está cheia.
+        """
+        if not self.running:
+            self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((row, future))
+        self.stats["enqueued"] += 1
+        depth = self._queue.qsize()
+        if depth > self.stats["max_depth"]:
+            self.stats["max_depth"] = depth
+        # Aviso único ao atingir 80% da fila; rearmado quando ela esvazia
+        if depth >= self.max_queue * 0.8 and not self._saturated:
+            self._saturated = True
+            logger.warning(f"⚠️ Fila de escrita em {depth}/{self.max_queue}. Aplicando backpressure.")
+        elif depth == 0:
+            self._saturated = False
+        return future
+
+    async def store(self, row: Dict) -> bool:
+        """Atalho: enfileira e aguarda o resultado da gravação."""
+        return await (await self.submit(row))
+
+    def note_checkpoint(self, channel: str, message_id: int):
+        """Registra o último id processado de um canal (sem I/O; vai para o banco no próximo lote)."""
+        if message_id > self._checkpoints.get(channel, 0):
+            self._checkpoints[channel] = message_id
+
+    def flush(self):
+        """
+        Pede a gravação imediata do que já está na fila (usado por produtores em
+        lote, como o backfill). Com a fila cheia o lote já sai por tamanho.
+        """
+        if self.running:
+            try:
+                self._queue.put_nowait(_FLUSH)
+            except asyncio.QueueFull:
+                pass
+
+    async def stop(self):
+        """Drena a fila, grava o que restou e encerra a thread de escrita."""
+        if self._task is None:
+            return
+        pending = self.depth
+        if pending:
+            logger.info(f"⏳ Drenando {pending} ofertas pendentes antes de encerrar...")
+        await self._queue.put(None)  # Sentinela de encerramento
+        await self._task
+        self._task = None
+        if self._checkpoints:
+            # Canais que só tiveram duplicatas/ignoradas desde o último lote
+            checkpoints, self._checkpoints = self._checkpoints, {}
+            try:
+                await asyncio.get_running_loop().run_in_executor(self._executor, self._write_batch, [], checkpoints)
+            except Exception as e:
+                logger.error(f"❌ Falha ao gravar checkpoints dos canais: {e}")
+        self._executor.shutdown(wait=True)
+        logger.info(f"🛑 Writer encerrado. Inseridas: {self.stats['inserted']}, duplicadas: {self.stats['duplicates']}.")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        closing = False
+        while not closing:
+            item = await self._queue.get()
+            if item is None:
+                break
+            if item is _FLUSH:
+                continue
+            batch: List[_Pending] = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                try:
+                    item = self._queue.get_nowait() if timeout <= 0 else await asyncio.wait_for(self._queue.get(), timeout)
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+                if item is None:
+                    closing = True
+                    break
+                if item is _FLUSH:
+                    break
+                batch.append(item)
+
+            await self._flush(loop, batch)
+
+    async def _flush(self, loop: asyncio.AbstractEventLoop, batch: List[_Pending]):
+        rows = [row for row, _ in batch]
+        checkpoints, self._checkpoints = self._checkpoints, {}
+        started = time.perf_counter()
+        try:
+            inserted_ids, commit_seconds = await loop.run_in_executor(
+                self._executor, self._write_batch, rows, checkpoints
+            )
+        except Exception as e:
+            # Os checkpoints voltam para a próxima tentativa
+            for channel, message_id in checkpoints.items():
+                self.note_checkpoint(channel, message_id)
+            self.stats["errors"] += 1
+            ERRORS.inc(component="writer")
+            logger.error(f"❌ Falha ao gravar lote de {len(rows)} ofertas: {e}", exc_info=True)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # Em um mesmo lote, apenas a primeira ocorrência de um id conta como inserida
+        for row, future in batch:
+            was_inserted = row["id"] in inserted_ids
+            inserted_ids.discard(row["id"])
+            if not future.done():
+                future.set_result(was_inserted)
+            self.stats["inserted" if was_inserted else "duplicates"] += 1
+
+        self.stats["batches"] += 1
+        DB_COMMIT_SECONDS.observe(commit_seconds)
+        BATCH_SIZE.observe(len(rows))
+        self.stats["last_batch_size"] = len(rows)
+        self.stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        if len(rows) > 1:
+            logger.debug(f"💾 Lote gravado: {len(rows)} linhas em {self.stats['last_flush_ms']}ms (fila: {self.depth}).")
+
+    @staticmethod
+    def _write_batch(rows: List[Dict], checkpoints: Dict[str, int] = None) -> Tuple[set, float]:
+        """
+        Executa o INSERT em lote na thread de escrita (e os checkpoints dos canais,
+        na mesma transação); retorna os ids inseridos e o tempo gasto.
+        """
+        db = SessionLocal()
+        try:
+            started = time.perf_counter()
+            inserted = set(db.execute(_INSERT_STMT, rows).scalars().all()) if rows else set()
+            if inserted:
+                mark_promotions_changed(db)
+            if checkpoints:
+                now = datetime.utcnow()
+                db.execute(_CHECKPOINT_STMT, [
+                    {"channel": channel, "last_message_id": message_id, "updated_at": now}
+                    for channel, message_id in checkpoints.items()
+                ])
+            db.commit()
+            return inserted, time.perf_counter() - started
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
@@ -1,28 +1,157 @@
+import argparse
 import asyncio
+import signal
+import sys
 import uvicorn
 import logging
 from multiprocessing import Process
 from app.main import app
-from core.bot import bot_worker
+from config import attach_log_queue, start_log_listener, stop_log_listener, use_watched_log_file
+from core.bot import PromotionBot, bot_worker
+from core.database import engine, init_db
 
 logger = logging.getLogger("Runner")
 
-def start_web():
+BACKFILL_SESSION = "promo_engine_session_backfill"
+
+def start_web(log_queue=None):
     """Inicia o Dashboard Web."""
+    if log_queue is not None:
+        attach_log_queue(log_queue)
     uvicorn.run(app, host="0.0.0.0", port=8002)
 
-async def start_bot():
+async def start_bot(bot: PromotionBot = bot_worker):
     """Inicia o Motor do Telegram."""
-    await bot_worker.start()
+    # SIGTERM (systemd/docker) desconecta o bot para que a fila de escrita seja drenada
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, lambda: loop.create_task(bot.stop()))
+    await bot.start()
 
-if __name__ == "__main__":
+def start_worker(index: int, count: int, log_queue=None):
+    """Um worker do modo particionado: sessão própria e apenas os canais da sua partição."""
+    if log_queue is not None:
+        attach_log_queue(log_queue)
+    # Conexões SQLite herdadas do processo pai (fork) não podem ser reutilizadas
+    engine.dispose(close=False)
+    try:
+        asyncio.run(start_bot(PromotionBot(shard=(index, count))))
+    except KeyboardInterrupt:
+        pass
+
+def run_backfill(args):
+    """Recupera mensagens perdidas durante reinícios/quedas e encerra."""
+    from core.backfill import Backfiller
+    channels = [c.strip() for c in args.channels.split(",")] if args.channels else None
+    # Sessão própria: duas conexões na mesma sessão SQLite do Telethon (a do `serve`)
+    # disputam o lock e sobrescrevem o estado de updates uma da outra
+    backfiller = Backfiller(PromotionBot(session=BACKFILL_SESSION), forward=args.forward)
+    asyncio.run(backfiller.backfill(
+        channels=channels, days=args.days, limit=args.limit,
+        concurrency=args.concurrency, capture_path=args.capture,
+    ))
+
+def run_replay(args):
+    """Reprocessa um arquivo JSONL local sem conexão com o Telegram."""
+    from core.backfill import Backfiller
+    asyncio.run(Backfiller(PromotionBot(session=BACKFILL_SESSION)).replay(args.path))
+
+def run_retention(args):
+    """Executa um ciclo de retenção agora (e, opcionalmente, o VACUUM completo) e encerra."""
+    from core.retention import RetentionScheduler, vacuum_full
+    asyncio.run(RetentionScheduler(days=args.days, archive=False if args.no_archive else None).run_once())
+    if args.vacuum:
+        vacuum_full()
+
+def run_server(workers: int = 1):
+    """Modo padrão: Dashboard Web + Bot em tempo real (ou N workers particionados)."""
+    # O processo principal é o único que grava (e rotaciona) o engine.log
+    log_queue = start_log_listener()
     # Inicia a Web em um processo separado
-    web_process = Process(target=start_web)
+    web_process = Process(target=start_web, args=(log_queue,))
     web_process.start()
 
-    # Inicia o Bot no loop principal
+    if workers <= 1:
+        # Inicia o Bot no loop principal
+        try:
+            asyncio.run(start_bot())
+        except (KeyboardInterrupt, SystemExit):
+            logger.info("Sistema encerrado pelo usuário.")
+        finally:
+            web_process.terminate()
+            web_process.join()
+            stop_log_listener()
+        return
+
+    # Modo particionado: o processo principal só supervisiona
+    bots = [Process(target=start_worker, args=(i, workers, log_queue), name=f"bot-{i}") for i in range(workers)]
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
     try:
-        asyncio.run(start_bot())
+        for bot in bots:
+            bot.start()
+        logger.info(f"🧩 {workers} workers iniciados: {', '.join(f'{b.name} (pid {b.pid})' for b in bots)}.")
+        for bot in bots:
+            bot.join()
     except (KeyboardInterrupt, SystemExit):
-        web_process.terminate()
-        logger.info("Sistema encerrado pelo usuário.")
\ No newline at end of file
+        logger.info("Sistema encerrado pelo usuário.")
+    finally:
+        # SIGTERM em cada worker: desconecta e drena a fila de escrita antes de sair
+        for process in bots + [web_process]:
+            if process.is_alive():
+                process.terminate()
+        for process in bots + [web_process]:
+            process.join()
+        stop_log_listener()
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="PromoEngine")
+    sub = parser.add_subparsers(dest="command")
+    serve = sub.add_parser("serve", help="Dashboard + bot em tempo real (padrão)")
+    serve.add_argument("--workers", type=int, default=1,
+                       help="Processos de bot, cada um com uma partição dos canais e sessão própria")
+
+    worker = sub.add_parser("worker", help="Executa um único worker particionado em primeiro plano")
+    worker.add_argument("--index", type=int, required=True)
+    worker.add_argument("--count", type=int, required=True)
+
+    backfill = sub.add_parser(
+        "backfill", help="Recupera o histórico dos canais monitorados (sessão própria: login no primeiro uso)"
+    )
+    backfill.add_argument("--channels", help="Lista separada por vírgulas (padrão: canais do painel)")
+    backfill.add_argument("--days", type=int, help="Alcance para canais sem checkpoint")
+    backfill.add_argument("--limit", type=int, help="Máximo de mensagens por canal")
+    backfill.add_argument("--concurrency", type=int, help="Canais paginados em paralelo")
+    backfill.add_argument("--capture", help="Grava as mensagens brutas em um JSONL para replay")
+    backfill.add_argument("--forward", action="store_true", help="Encaminha os matches ao grupo privado")
+
+    replay = sub.add_parser("replay", help="Reprocessa um arquivo JSONL capturado")
+    replay.add_argument("path")
+
+    retention = sub.add_parser("retention", help="Arquiva/remove ofertas expiradas agora")
+    retention.add_argument("--days", type=int, help="Dias mantidos no banco (padrão: RETENTION_DAYS)")
+    retention.add_argument("--no-archive", action="store_true", help="Apaga sem gravar em ARCHIVE_DIR")
+    retention.add_argument("--vacuum", action="store_true",
+                           help="VACUUM completo ao final (com o bot parado; ativa o auto_vacuum incremental)")
+    return parser
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+
+    # Comandos avulsos rodam ao lado do `serve`: só o processo principal rotaciona o log
+    # (um `worker --index 0` sem `serve` assume a rotação)
+    if args.command in ("backfill", "replay", "retention") or (args.command == "worker" and args.index > 0):
+        use_watched_log_file()
+
+    # Garante tabelas/colunas atualizadas antes de qualquer modo
+    init_db()
+
+    if args.command == "backfill":
+        run_backfill(args)
+    elif args.command == "replay":
+        run_replay(args)
+    elif args.command == "retention":
+        run_retention(args)
+    elif args.command == "worker":
+        # Útil para o primeiro login (código por SMS) de cada sessão ou para um serviço por worker
+        start_worker(args.index, args.count)
+    else:
+        run_server(getattr(args, "workers", 1))
\ No newline at end of file
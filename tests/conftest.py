@@ -0,0 +1,17 @@
+import os
+import sys
+import tempfile
+
+# Docstring: O motivo desta lógica existir é rodar os testes sem .env e sem sujar
+# o projeto: as variáveis obrigatórias recebem valores fictícios e o diretório
+# de trabalho (logs/, banco SQLite, métricas) é uma pasta temporária, definida
+# antes de qualquer import de config/core.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SANDBOX = tempfile.mkdtemp(prefix="promo-tests-")
+
+for key, value in {"API_ID": "1", "API_HASH": "test", "PHONE_NUMBER": "0", "MY_PRIVATE_GROUP_ID": "1"}.items():
+    os.environ.setdefault(key, value)
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(SANDBOX, 'test.db')}"
+os.environ["METRICS_DIR"] = os.path.join(SANDBOX, "metrics")
+sys.path.insert(0, ROOT)
+os.chdir(SANDBOX)
@@ -0,0 +1,41 @@
+import asyncio
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.main import save_configs
+from core.database import AsyncSessionLocal, ConfigModel, SessionLocal, async_engine, init_db
+
+
+def _version() -> int:
+    db = SessionLocal()
+    try:
+        return db.query(ConfigModel.version).filter(ConfigModel.id == "global").scalar() or 0
+    finally:
+        db.close()
+
+
+def test_concurrent_saves_never_lose_a_version(monkeypatch):
+    init_db()
+    before = _version()
+    real_execute = AsyncSession.execute
+
+    async def interleaved_execute(self, *args, **kwargs):
+        # Cede o loop após cada comando para que os salvamentos se intercalem
+        result = await real_execute(self, *args, **kwargs)
+        await asyncio.sleep(0.01)
+        return result
+
+    monkeypatch.setattr(AsyncSession, "execute", interleaved_execute)
+
+    async def save(i: int):
+        async with AsyncSessionLocal() as db:
+            await save_configs(keywords=f"ssd,kw{i}", channels="pelando", db=db)
+
+    async def scenario():
+        try:
+            # Primeira rodada cria a linha "global"; a segunda incrementa a existente
+            for _ in range(2):
+                await asyncio.gather(*(save(i) for i in range(5)))
+        finally:
+            await async_engine.dispose()
+
+    asyncio.run(scenario())
+    assert _version() == before + 10
@@ -0,0 +1,61 @@
+import asyncio
+from datetime import datetime, timezone
+import pytest
+from bench.fakes import FakeClient
+from core import bot as bot_module
+from core.bot import PromotionBot
+from core.database import init_db
+
+TEXT = "🔥 Air Fryer Mondial\n✅ Por R$ 299,90\nhttps://www.amazon.com.br/dp/B0RETRY01?tag=x-20"
+
+
+def test_failure_between_dedup_and_store_allows_retry(monkeypatch):
+    init_db()
+    bot = PromotionBot(client=FakeClient())
+    real_extract = bot_module.extractor.extract
+    calls = []
+
+    def flaky_extract(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise ValueError("falha simulada na extração")
+        return real_extract(*args, **kwargs)
+
+    monkeypatch.setattr(bot_module.extractor, "extract", flaky_extract)
+
+    async def scenario():
+        bot.writer.start()
+        try:
+            posted = datetime.now(timezone.utc)
+            with pytest.raises(ValueError):
+                await bot.process_message("pelando", TEXT, posted, forward=False)
+            # A falha não deixa o id marcado como visto: a nova tentativa grava
+            return await bot.process_message("pelando", TEXT, posted, forward=False)
+        finally:
+            await bot.writer.stop()
+
+    assert asyncio.run(scenario()) == "stored"
+
+
+def test_live_messages_advance_channel_checkpoint():
+    from bench.fakes import FakeEvent
+    from core.backfill import load_checkpoint
+
+    init_db()
+    bot = PromotionBot(client=FakeClient())
+    posted = datetime.now(timezone.utc)
+    events = [
+        FakeEvent.build("Pelando", "Cupom APP20 R$ 10,00 https://kabum.com.br/produto/1", posted),
+        FakeEvent.build("Pelando", "Cupom APP20 R$ 10,00 https://kabum.com.br/produto/1", posted),  # duplicata
+    ]
+
+    async def scenario():
+        bot.writer.start()
+        try:
+            return [await bot.message_handler(event) for event in events]
+        finally:
+            await bot.writer.stop()
+
+    assert asyncio.run(scenario()) == ["stored", "duplicate"]
+    # O checkpoint inclui mensagens que não geraram gravação (a duplicata)
+    assert load_checkpoint("pelando") == events[-1].message.id
@@ -0,0 +1,71 @@
+from core.extraction import DEFAULT_STORE, canonical_link, detect_store, extractor
+
+AIR_FRYER = (
+    "🔥 Air Fryer Mondial 4L\n\n"
+    "❌ De R$ 499,90\n"
+    "✅ Por R$ 299,90\n"
+    "💳 ou 10x de R$ 29,99 sem juros\n"
+    "🎟️ Cupom: PROMO10\n\n"
+    "🛒 Compre aqui: https://www.amazon.com.br/dp/B0ABC123?tag=promo-20&ascsubtag=991"
+)
+
+
+def test_de_por_cues_and_full_offer():
+    fields = extractor.scan(AIR_FRYER)
+    assert fields["titulo"] == "🔥 Air Fryer Mondial 4L"
+    assert fields["preco"] == 299.9
+    assert fields["preco_original"] == 499.9
+    assert (fields["parcelas"], fields["valor_parcela"]) == (10, 29.99)
+    assert fields["cupom"] == "PROMO10"
+    assert fields["loja"] == "Amazon"
+    assert fields["link"] == "https://amazon.com.br/dp/B0ABC123"
+
+
+def test_era_agora_cues_and_thousands_separator():
+    fields = extractor.scan("Monitor LG era R$ 1.299,00 agora R$ 999,00 https://kabum.com.br/produto/1")
+    assert (fields["preco"], fields["preco_original"]) == (999.0, 1299.0)
+
+
+def test_old_price_not_above_current_is_dropped():
+    fields = extractor.scan("De R$ 100,00 por R$ 120,00")
+    assert (fields["preco"], fields["preco_original"]) == (120.0, None)
+
+
+def test_price_from_installments_only():
+    fields = extractor.scan("Notebook em 12x de R$ 250,00 sem juros https://a.co/d/xyz")
+    assert (fields["parcelas"], fields["valor_parcela"]) == (12, 250.0)
+    assert fields["preco"] == 3000.0
+
+
+def test_coupon_variants():
+    assert extractor.scan("Use o cupom de desconto: APP20")["cupom"] == "APP20"
+    assert extractor.scan("código BLACK30 no carrinho")["cupom"] == "BLACK30"
+    assert extractor.scan("sem cupom hoje")["cupom"] is None
+
+
+def test_store_index_resolves_subdomains():
+    assert detect_store("https://produto.mercadolivre.com.br/MLB-123") == "Mercado Livre"
+    assert detect_store("https://www.magazineluiza.com.br/p/1") == "Magalu"
+    assert detect_store("https://loja-desconhecida.com/x") is None
+    assert extractor.scan("https://loja-desconhecida.com/x")["loja"] == DEFAULT_STORE
+
+
+def test_canonical_link_strips_tracking():
+    assert canonical_link(
+        "https://www.Amazon.com.br/dp/B0X/?tag=promo-20&utm_source=tg&th=1#reviews"
+    ) == "https://amazon.com.br/dp/B0X?th=1"
+    assert canonical_link("https://shopee.com.br/product/1?smtt=9&sp_atk=abc") == "https://shopee.com.br/product/1"
+
+
+def test_image_links_are_kept_apart():
+    fields = extractor.scan("Foto https://cdn.loja.com/img/produto.JPG link https://kabum.com.br/produto/9")
+    assert fields["imagem_url"] == "https://cdn.loja.com/img/produto.JPG"
+    assert fields["link"] == "https://kabum.com.br/produto/9"
+
+
+def test_malformed_url_does_not_raise():
+    # urlsplit levanta "Invalid IPv6 URL"; a mensagem não pode ser perdida
+    fields = extractor.scan("Oferta https://[quebrado R$ 10,00")
+    assert fields["preco"] == 10.0
+    item = extractor.extract("Oferta https://[quebrado R$ 10,00", "@pelando", "abc")
+    assert item.preco == 10.0
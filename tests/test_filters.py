@@ -0,0 +1,101 @@
+import random
+import re
+from typing import Dict, List, Optional
+from core.filters import KeywordMatcher, _trie_pattern, fold_text
+
+
+def test_trie_pattern_matches_exactly_the_keywords():
+    words = ["cel", "celular", "celulares", "ce", "c++", "tv 4k", "tv"]
+    regex = re.compile(_trie_pattern(words))
+    for word in words:
+        assert regex.fullmatch(word), word
+    for other in ["c", "celu", "celulare", "c+", "tv 4", "tv4k"]:
+        assert not regex.fullmatch(other), other
+
+
+def test_overlapping_prefixes_prefer_the_longest_keyword():
+    matcher = KeywordMatcher(["cel", "celular"])
+    assert matcher.search("Celular Samsung em oferta") == "celular"
+    assert matcher.search("Capinha de cel") == "cel"
+    assert matcher.find_all("cel ou celular?") == ["cel", "celular"]
+
+
+def test_word_boundary_rejects_partial_words():
+    matcher = KeywordMatcher(["cel", "tv"], word_boundary=True)
+    assert matcher.search("Celular Samsung") is None
+    assert matcher.search("Suporte de TV, cel e tablet") == "tv"
+    assert matcher.find_all("Suporte de TV, cel e tablet") == ["tv", "cel"]
+    # Sem limite de palavra, o prefixo dentro de "celular" casa
+    assert KeywordMatcher(["cel"]).search("Celular Samsung") == "cel"
+
+
+def test_word_boundary_backtracks_to_a_shorter_keyword():
+    matcher = KeywordMatcher(["cel", "celulares"], word_boundary=True)
+    assert matcher.search("celular barato") is None
+    assert matcher.search("cel barato") == "cel"
+    assert matcher.search("celulares baratos") == "celulares"
+
+
+def test_accent_folding_returns_the_registered_keyword():
+    matcher = KeywordMatcher(["Câmera", "fone"])
+    assert matcher.search("Camera digital") == "Câmera"
+    assert matcher.search("CÂMERA digital") == "Câmera"
+    assert matcher.search("Fône bluetooth") == "fone"
+
+    strict = KeywordMatcher(["Câmera"], accent_insensitive=False)
+    assert strict.search("Camera digital") is None
+    assert strict.search("câmera digital") == "Câmera"
+
+
+# --- Comparação com uma implementação ingênua ---------------------------------------
+
+def _naive_find_all(keywords: List[str], text: str, word_boundary: bool) -> List[str]:
+    """Referência lenta: a cada posição tenta todas as palavras, a mais longa primeiro."""
+    originals: Dict[str, str] = {}
+    for kw in keywords:
+        folded = fold_text(kw)
+        if folded:
+            originals.setdefault(folded, kw)
+    text = fold_text(text)
+
+    def fits(start: int, word: str) -> bool:
+        if not text.startswith(word, start):
+            return False
+        if not word_boundary:
+            return True
+        end = start + len(word)
+        before = start > 0 and re.match(r"\w", text[start - 1])
+        after = end < len(text) and re.match(r"\w", text[end])
+        return not before and not after
+
+    found: Dict[str, None] = {}
+    pos = 0
+    while pos < len(text):
+        match: Optional[str] = None
+        for start in range(pos, len(text)):
+            candidates = [word for word in originals if fits(start, word)]
+            if candidates:
+                match = max(candidates, key=len)
+                break
+        if match is None:
+            break
+        found.setdefault(originals[match])
+        pos = start + len(match)
+    return list(found)
+
+
+def test_matcher_agrees_with_naive_scan():
+    rng = random.Random(20240611)
+    keyword_alphabet = "abcá.+"
+    text_alphabet = "abcáÁ.+ "
+    for _ in range(2000):
+        keywords = [
+            "".join(rng.choice(keyword_alphabet) for _ in range(rng.randint(1, 4)))
+            for _ in range(rng.randint(1, 6))
+        ]
+        text = "".join(rng.choice(text_alphabet) for _ in range(rng.randint(0, 30)))
+        for word_boundary in (False, True):
+            matcher = KeywordMatcher(keywords, word_boundary=word_boundary)
+            expected = _naive_find_all(keywords, text, word_boundary)
+            assert matcher.find_all(text) == expected, (keywords, text, word_boundary)
+            assert matcher.search(text) == (expected[0] if expected else None), (keywords, text, word_boundary)
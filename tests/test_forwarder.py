@@ -0,0 +1,46 @@
+import asyncio
+from bench.fakes import FakeClient
+from core.database import init_db
+from core.forwarder import Forwarder, TokenBucket
+
+
+async def _enqueue(forwarder: Forwarder, promo_id: str, priority: float):
+    await forwarder.enqueue(promo_id=promo_id, fonte="pelando", keyword="ssd", priority=priority,
+                            titulo=promo_id, preco=None, link="https://exemplo.com", texto=promo_id)
+
+
+def test_higher_priority_arriving_during_rate_limit_wait_goes_first():
+    init_db()
+    client = FakeClient()
+    forwarder = Forwarder(client, target_chat=1, worker=7, workers=8)
+    forwarder.digest_seconds = 0
+    # Sem tokens: o próximo envio só sai em ~0,3s
+    forwarder.bucket = TokenBucket(rate_per_second=1 / 0.3, burst=1)
+    forwarder.bucket.drain()
+
+    async def scenario():
+        await _enqueue(forwarder, "baixa", priority=1)
+        forwarder.start()
+        try:
+            await asyncio.sleep(0.1)
+            await _enqueue(forwarder, "alta", priority=10)
+            for _ in range(100):
+                if len(client.sent) >= 2:
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            await forwarder.stop()
+
+    asyncio.run(scenario())
+    assert [sent.payload for sent in client.sent] == ["alta", "baixa"]
+
+
+def test_empty_queue_returns_the_token():
+    bucket = TokenBucket(rate_per_second=0.001, burst=2)
+
+    async def scenario():
+        await bucket.acquire()
+        bucket.release()
+
+    asyncio.run(scenario())
+    assert bucket.tokens >= 2 - 1e-3